@@ -1 +1,3 @@
-from routes18xx.find_best_routes import find_best_routes, LOG
\ No newline at end of file
+__version__ = "0.9.2"
+
+from routes18xx.find_best_routes import find_best_routes, LOG
@@ -0,0 +1,109 @@
+"""
+An asyncio interface to the route finder, for embedding it in an asyncio service.
+
+Calculations run in a thread pool, so they never block the event loop, and share one worker pool. At most
+max_concurrency calculations run at once, and waiting calculations are started in the order they were requested. A
+batch is a single calculation, which walks the board once for all of its railroads (see iter_best_routes()).
+
+Cancelling the awaiting task cancels the calculation, which stops (and frees up the worker pool) soon after.
+
+Each calculation runs with its own copy of the game, so calculations for different states of the same game don't
+overwrite each other's phase.
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+
+from routes18xx.cancellation import CancelToken, Cancelled
+from routes18xx.find_best_routes import WorkerPool, _get_active_railroads, find_best_routes, iter_best_routes
+
+
+def _find_best_routes_batch(game, board, railroads, active_railroad_names, worker_pool, cancel_token):
+    # Railroads complete in any order, but are returned in the order they were requested.
+    best_route_sets = {railroad.name: None for railroad in _get_active_railroads(railroads, active_railroad_names)}
+    for railroad, best_route_set in iter_best_routes(game, board, railroads, active_railroad_names, worker_pool, cancel_token):
+        best_route_sets[railroad.name] = best_route_set
+    return best_route_sets
+
+
+class AsyncRouteFinder:
+    def __init__(self, max_concurrency=1, processes=None, worker_pool=None):
+        """
+        If no worker pool is given, one is created with the given number of processes, and closed along with the
+        finder.
+        """
+        self.max_concurrency = max_concurrency
+        self._owns_worker_pool = worker_pool is None
+        self.worker_pool = worker_pool or WorkerPool(processes)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="routes18xx")
+        # Created by the first calculation, so the finder can be created outside of the event loop it's used on.
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        if not self._semaphore:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def find_best_routes(self, game, board, railroads, active_railroad, progress=None):
+        """
+        Returns the active railroad's best route set. If provided, progress is called on the event loop, with the
+        same arguments as find_best_routes().
+        """
+        if progress:
+            progress = functools.partial(asyncio.get_running_loop().call_soon_threadsafe, progress)
+        return await self._run(functools.partial(find_best_routes, game.copy(), board, railroads, active_railroad,
+                self.worker_pool, progress=progress))
+
+    async def find_best_routes_batch(self, game, board, railroads, active_railroad_names=None):
+        """
+        Returns a dict of railroad name to best route set, in the requested order. If no railroad names are given,
+        every railroad in play is included.
+        """
+        return await self._run(functools.partial(_find_best_routes_batch, game.copy(), board, railroads,
+                active_railroad_names, self.worker_pool))
+
+    async def _run(self, calculation):
+        """Runs the calculation in the thread pool once a slot is free, passing it a cancel_token keyword argument."""
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            cancel_token = CancelToken()
+            future = loop.run_in_executor(self._executor, functools.partial(calculation, cancel_token=cancel_token))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                cancel_token.cancel()
+                # Keep the slot until the calculation stops, so the next one doesn't have to share the worker pool.
+                with contextlib.suppress(Cancelled):
+                    await future
+                raise
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        if self._owns_worker_pool:
+            self.worker_pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        # Waiting for the threads to finish would block the event loop.
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+async def find_best_routes_async(game, board, railroads, active_railroad, finder=None, progress=None):
+    """
+    Like find_best_routes(), but doesn't block the event loop. Without a finder, a temporary one (and worker pool) is
+    created for the calculation.
+    """
+    if not finder:
+        async with AsyncRouteFinder() as finder:
+            return await finder.find_best_routes(game, board, railroads, active_railroad, progress)
+    return await finder.find_best_routes(game, board, railroads, active_railroad, progress)
+
+async def find_best_routes_batch_async(game, board, railroads, active_railroad_names=None, finder=None):
+    """Like find_best_routes_batch(), but doesn't block the event loop."""
+    if not finder:
+        async with AsyncRouteFinder() as finder:
+            return await finder.find_best_routes_batch(game, board, railroads, active_railroad_names)
+    return await finder.find_best_routes_batch(game, board, railroads, active_railroad_names)
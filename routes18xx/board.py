@@ -5,21 +5,83 @@ from routes18xx import boardtile, cell, games
 from routes18xx.placedtile import PlacedTile, SplitCity
 from routes18xx.tokens import Station
 
+# Pristine base boards which have already been built in this process, by game name.
+_BASE_BOARDS = {}
+
+def _number_edges(cells):
+    """Returns the bit for each edge between two neighboring cells, in a fixed order."""
+    edge_bits = {}
+    for row in sorted(cells):
+        for column in sorted(cells[row]):
+            cell = cells[row][column]
+            for orientation in range(6):
+                neighbor = cell.neighbors.get(orientation)
+                if neighbor:
+                    edge_bits.setdefault(frozenset((cell, neighbor)), 1 << len(edge_bits))
+    return edge_bits
+
 class Board(object):
     @staticmethod
     def load(game):
+        """
+        Returns a new base board for the game. The base board is only built
+        once per process. Each call returns a cheap copy of it.
+        """
+        base_board = _BASE_BOARDS.get(game.name)
+        if not base_board:
+            base_board = Board.build(game)
+            _BASE_BOARDS[game.name] = base_board
+        return base_board.copy(game)
+
+    @staticmethod
+    def build(game):
         cells = cell.load(game)
         board = Board(game, cells)
         board._board_tiles = {board_tile.cell: board_tile for board_tile in boardtile.load(game, board)}
         return board
 
-    def __init__(self, game, cells):
+    @staticmethod
+    def clear_cache():
+        _BASE_BOARDS.clear()
+
+    def __init__(self, game, cells, edge_bits=None):
         self.game = game
         self._cells = cells
 
         self._board_tiles = {}
         self._placed_tiles = {}
 
+        # The cells whose spaces belong only to this board, and so can be modified in place. Every other space may be
+        # shared with a copy of this board, and is copied before it's modified.
+        self._owned_cells = set()
+
+        # (from cell, to cell) => track segment. See track_segment().
+        self._track_segments = {}
+        # (stop cell, exit cell) => stop segments. See stop_segments().
+        self._stop_segments = {}
+        # The bit for each edge between two cells. Every edge on the map is numbered up front, so the numbering never
+        # changes, and can be shared with every copy of the board, even across threads.
+        self._edge_bits = edge_bits if edge_bits is not None else _number_edges(cells)
+
+    def copy(self, game=None):
+        """
+        Returns a copy of this board. Cells and spaces are shared between the copies until one of them modifies a
+        space (e.g. by placing a station), at which point that space is copied.
+        """
+        board = Board(game or self.game, self._cells, self._edge_bits)
+        board._board_tiles = self._board_tiles.copy()
+        board._placed_tiles = self._placed_tiles.copy()
+
+        # The segments are shared until either board changes its track, at which point it starts its own. Boards
+        # sharing them may be used from different threads, so segments are only ever added with setdefault(): a
+        # segment only depends on the track, so whichever thread stores it first stores the same segment as the other.
+        board._track_segments = self._track_segments
+        board._stop_segments = self._stop_segments
+
+        # Everything this board owned is now shared.
+        self._owned_cells.clear()
+        return board
+
     def cell(self, coord):
         if len(coord) < 2 or len(coord) > 3:
             raise ValueError(f"Provided invalid coord: {coord}")
@@ -49,10 +111,12 @@ class Board(object):
             self._validate_place_tile_upgrade(old_tile, cell, tile, orientation)
 
         self._placed_tiles[cell] = PlacedTile.place(cell, tile, orientation, old_tile)
+        self._owned_cells.add(cell)
+        self._reset_segments()
 
     def place_station(self, game, coord, railroad):
         cell = self.cell(coord)
-        tile = self.get_space(cell)
+        tile = self._get_writable_space(cell)
         if not tile.is_city:
             raise ValueError(f"{cell} is not a city, so it cannot have a station.")
 
@@ -63,7 +127,7 @@ class Board(object):
 
     def place_split_station(self, game, coord, railroad, branch):
         cell = self.cell(coord)
-        space = self.get_space(cell)
+        space = self._get_writable_space(cell)
         if not space.is_city:
             raise ValueError(f"{cell} is not a city, so it cannot have a station.")
 
@@ -75,7 +139,13 @@ class Board(object):
             raise ValueError(f"A removed railroad cannot place a token: {railroad.name}")
 
         current_cell = self.cell(coord)
-        self.get_space(current_cell).place_token(railroad, TokenType)
+        self._get_writable_space(current_cell).place_token(railroad, TokenType)
+
+    def set_home(self, coord, railroad_name):
+        self._get_writable_space(self.cell(coord)).home = railroad_name
+
+    def set_reserved(self, coord, railroad_name):
+        self._get_writable_space(self.cell(coord)).reserved = railroad_name
 
     def stations(self, railroad_name=None):
         all_tiles = list(self._placed_tiles.values()) + list(self._board_tiles.values())
@@ -88,6 +158,131 @@ class Board(object):
     def get_space(self, cell):
         return self._placed_tiles.get(cell) or self._board_tiles.get(cell)
 
+    def track_segment(self, from_cell, to_cell):
+        """
+        Follows the track from from_cell into to_cell, for as long as it runs through plain track with only one way
+        out, i.e. until it reaches a stop, a junction, a dead end, or track it has already followed. Returns the plain
+        track spaces followed, and the [from cell, to cell] pairs for every step, including the step into the space
+        the segment ends at.
+        """
+        key = (from_cell, to_cell)
+        if key not in self._track_segments:
+            spaces = []
+            paths = [[from_cell, to_cell]]
+            while True:
+                enter_from, cell = paths[-1]
+                space = self.get_space(cell)
+                if not space or space.is_stop or enter_from not in space.paths():
+                    break
+
+                exits = space.paths(enter_from)
+                if len(exits) != 1 or [cell, exits[0]] in paths or [exits[0], cell] in paths:
+                    break
+
+                spaces.append(space)
+                paths.append([cell, exits[0]])
+            return self._track_segments.setdefault(key, (tuple(spaces), paths))
+        return self._track_segments[key]
+
+    def _reset_segments(self):
+        # Replaced, rather than cleared, since they may be shared with copies of this board.
+        self._track_segments = {}
+        self._stop_segments = {}
+
+    def edge_bit(self, path):
+        """Returns the bit for the edge between the [from cell, to cell] pair, in either direction."""
+        return self._edge_bits[frozenset(path)]
+
+    def stop_segments(self, stop_cell, exit_cell):
+        """
+        Returns every way the track leaving stop_cell towards exit_cell can reach the next stop without reusing any
+        edge, along with every cell looked at along the way. Each segment is a (spaces, paths, edges) tuple: the
+        non-stop spaces passed, the [from cell, to cell] pairs for every step (the last of which enters the next
+        stop), and the bitmask of the edges used (see edge_bit()).
+        """
+        key = (stop_cell, exit_cell)
+        if key not in self._stop_segments:
+            segments = []
+            touched_cells = set()
+            self._follow_stop_segment(stop_cell, exit_cell, (), [], 0, segments, touched_cells)
+            return self._stop_segments.setdefault(key, (tuple(segments), touched_cells))
+        return self._stop_segments[key]
+
+    def reachable_cells(self, railroad, stops, count_towns=True):
+        """
+        Returns every cell a route of at most the given number of stops could reach, starting from one of the
+        railroad's stations. A route ends at a stop it can't pass (see passable()). If count_towns isn't set, towns
+        don't count towards the stops.
+
+        Routes may reuse track and stops here, and split cities are passed from either side, since the route through
+        one may run the other way. So every route which includes one of the railroad's stations only uses these cells,
+        but not every route using them includes a station.
+        """
+        reachable = set()
+        # (stop cell, cell it was entered from) => the fewest stops used to get there
+        fewest_stops = {}
+        queue = collections.deque((station.cell, None, 1) for station in self.stations(railroad.name))
+        while queue:
+            cell, enter_from, used_stops = queue.popleft()
+            if fewest_stops.get((cell, enter_from), stops + 1) <= used_stops:
+                continue
+            fewest_stops[(cell, enter_from)] = used_stops
+            reachable.add(cell)
+
+            space = self.get_space(cell)
+            if used_stops == stops or (enter_from and not isinstance(space, (boardtile.SplitCity, SplitCity)) \
+                    and not space.passable(enter_from, railroad)):
+                continue
+
+            for exit_cell in space.paths(enter_from, railroad):
+                for spaces, paths, edges in self.stop_segments(cell, exit_cell)[0]:
+                    next_enter_from, next_cell = paths[-1]
+                    next_space = self.get_space(next_cell)
+                    next_used_stops = used_stops + (1 if count_towns or not next_space.is_town else 0)
+                    if next_used_stops <= stops:
+                        reachable.update(path[1] for path in paths)
+                        queue.append((next_cell, next_enter_from, next_used_stops))
+        return reachable
+
+    def _follow_stop_segment(self, from_cell, to_cell, spaces, paths, edges, segments, touched_cells):
+        chain_spaces, chain_paths = self.track_segment(from_cell, to_cell)
+        chain_edges = 0
+        for path in chain_paths:
+            chain_edges |= self.edge_bit(path)
+            touched_cells.add(path[1])
+        if chain_edges & edges:
+            return
+
+        spaces += chain_spaces
+        paths = paths + chain_paths
+        edges |= chain_edges
+
+        enter_from, cell = paths[-1]
+        space = self.get_space(cell)
+        if not space or enter_from not in space.paths():
+            return
+
+        if space.is_stop:
+            segments.append((spaces, paths, edges))
+        else:
+            # A junction, so follow each branch.
+            for exit_cell in space.paths(enter_from):
+                self._follow_stop_segment(cell, exit_cell, spaces + (space, ), paths, edges, segments, touched_cells)
+
+    def _get_writable_space(self, cell):
+        space = self.get_space(cell)
+        if space and cell not in self._owned_cells:
+            # Segments hold on to the non-stop spaces they pass through.
+            if not space.is_stop:
+                self._reset_segments()
+            space = space.copy()
+            if cell in self._placed_tiles:
+                self._placed_tiles[cell] = space
+            else:
+                self._board_tiles[cell] = space
+            self._owned_cells.add(cell)
+        return space
+
     def validate(self):
         self._validate_tiles_connected()
         self._validate_tiles_upgrade_level()
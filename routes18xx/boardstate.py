@@ -14,7 +14,8 @@ def load(game, board_state_rows):
     board = Board.load(game)
 
     tile_args_dicts = []
-    for tile_args in board_state_rows:
+    for row in board_state_rows:
+        tile_args = dict(row)
         missing = [arg for arg in FIELDNAMES if tile_args.get(arg) is None]
         if missing:
             raise ValueError(f"Invalid board state input. Row missing {', '.join(missing)}: {tile_args}")
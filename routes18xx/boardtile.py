@@ -1,4 +1,5 @@
 import collections
+import copy
 import itertools
 import json
 
@@ -49,6 +50,11 @@ class BoardSpace(object):
     def passable(self, enter_cell, railroad):
         return True
 
+    def copy(self):
+        space = copy.copy(self)
+        space.tokens = list(self.tokens)
+        return space
+
 class Track(BoardSpace):
     @staticmethod
     def create(cell, edges, upgrade_level=None):
@@ -101,6 +107,11 @@ class City(BoardSpace):
     def stations(self):
         return tuple(self._stations)
 
+    def copy(self):
+        space = super().copy()
+        space._stations = list(self._stations)
+        return space
+
     def value(self, game, railroad, train):
         return self._value + sum(token.value(game, railroad) for token in self.tokens)
 
@@ -180,6 +191,11 @@ class SplitCity(City):
 
         self.branch_to_station = {key: [] for key in self.capacity.keys()}
 
+    def copy(self):
+        space = super().copy()
+        space.branch_to_station = {branch: list(stations) for branch, stations in self.branch_to_station.items()}
+        return space
+
     def add_station(self, game, railroad, branch):
         if self.has_station(railroad.name):
             raise ValueError(f"{railroad.name} already has a station in {self.name} ({self.cell}).")
@@ -272,10 +288,9 @@ class WesternTerminus(Terminus):
 
 def load(game, board):
     board_tiles = []
-    with open(game.get_data_file(BASE_BOARD_FILENAME)) as board_file:
-        board_json = json.load(board_file)
-        board_tiles.extend([Track.create(board.cell(coord), **track_args) for coord, track_args in board_json.get("tracks", {}).items()])
-        board_tiles.extend([Town.create(board.cell(coord), **town_args) for coord, town_args in board_json.get("towns", {}).items()])
-        board_tiles.extend([City.create(board.cell(coord), **city_args) for coord, city_args in board_json.get("cities", {}).items()])
-        board_tiles.extend([Terminus.create(board.cell(coord), **board_edge_args) for coord, board_edge_args in board_json.get("termini", {}).items()])
+    board_json = game.load_data(BASE_BOARD_FILENAME)
+    board_tiles.extend([Track.create(board.cell(coord), **track_args) for coord, track_args in board_json.get("tracks", {}).items()])
+    board_tiles.extend([Town.create(board.cell(coord), **town_args) for coord, town_args in board_json.get("towns", {}).items()])
+    board_tiles.extend([City.create(board.cell(coord), **city_args) for coord, city_args in board_json.get("cities", {}).items()])
+    board_tiles.extend([Terminus.create(board.cell(coord), **board_edge_args) for coord, board_edge_args in board_json.get("termini", {}).items()])
     return board_tiles
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Finds the best routes for many game snapshots from a single bulk input file.
+
+The input is JSONL: one JSON object per line, each in the same format as a route server payload (see
+routes18xx.payload), with an optional "id" key to identify the snapshot. Blank lines are skipped.
+
+The output is NDJSON, with one object per snapshot, in input order:
+- id: the snapshot's id, if it had one.
+- line: the snapshot's line number in the input.
+- results: one record per railroad, in the same format as `calc-routes --format json`.
+- error: instead of results, if the snapshot couldn't be processed.
+
+Snapshots are spread across a process pool. Each one is computed entirely inside a single worker process. Input is
+read lazily, and only a bounded number of snapshots are in flight at a time, so memory use doesn't depend on the size
+of the input.
+"""
+import argparse
+import collections
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from routes18xx import payload, tracing
+from routes18xx.find_best_routes import LOG, SerialWorkerPool, iter_best_routes, result_to_dict
+
+DESCRIPTION = "Find the best routes for every snapshot in a JSONL file, writing one NDJSON result per snapshot."
+
+
+def iter_records(lines):
+    """Yields (line number, line) pairs for each non-blank line. Lines are parsed by the workers, not here."""
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line:
+            yield line_number, line
+
+def process_record(line_number, line):
+    """Returns the output object for a single snapshot. Invalid snapshots get an error instead of results."""
+    start_time = time.perf_counter()
+    output = {"line": line_number}
+    try:
+        record = json.loads(line)
+        if isinstance(record, dict) and "id" in record:
+            output = {"id": record["id"], "line": line_number}
+
+        game, board, railroads_in_play, active_railroad_names = payload.load(record)
+        # Everything runs serially here, since each snapshot already has a worker process to itself.
+        results = iter_best_routes(game, board, railroads_in_play, active_railroad_names, SerialWorkerPool())
+        output["results"] = [result_to_dict(railroad, best_route_set, time.perf_counter() - start_time) for railroad, best_route_set in results]
+    except ValueError as exc:
+        output["error"] = str(exc)
+    except Exception as exc:
+        LOG.exception(f"Failed to process line {line_number}.")
+        output["error"] = f"{type(exc).__name__}: {exc}"
+    return output
+
+def _process_record_worker(args):
+    return process_record(*args)
+
+def iter_results(lines, processes=None, max_in_flight=None):
+    """
+    Yields the output object for each snapshot in lines, in input order. At most max_in_flight snapshots (by default,
+    twice the number of processes) are read ahead of the last one yielded.
+    """
+    processes = processes or os.cpu_count()
+    max_in_flight = max_in_flight or processes * 2
+
+    records = iter_records(lines)
+    with multiprocessing.Pool(processes=processes, initializer=tracing.init_worker, initargs=(tracing.TRACER.filepath, )) as pool:
+        in_flight = collections.deque()
+        for record in records:
+            in_flight.append(pool.apply_async(_process_record_worker, (record, )))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().get()
+
+        while in_flight:
+            yield in_flight.popleft().get()
+
+def add_arguments(parser):
+    """Adds this mode's arguments to the parser. The calc-routes command registers them as its bulk mode."""
+    parser.add_argument("input",
+            help="The JSONL file to read snapshots from, or - for stdin.")
+    parser.add_argument("-o", "--output",
+            help="The file to write results to. Default: stdout.")
+    parser.add_argument("-j", "--processes", type=int,
+            help="The number of worker processes. Default: the number of CPUs.")
+    parser.add_argument("--max-in-flight", type=int,
+            help="The maximum number of snapshots being processed or waiting to be written. Default: twice the number of processes.")
+    parser.add_argument("-v", "--verbose", action="store_true")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="calc-routes bulk", description=DESCRIPTION)
+    add_arguments(parser)
+    return vars(parser.parse_args(argv))
+
+def main(argv=None):
+    run(parse_args(argv))
+
+def run(args):
+    logger = logging.getLogger("routes18xx")
+    logger.addHandler(logging.StreamHandler(sys.stderr))
+    logger.setLevel(logging.DEBUG if args["verbose"] else logging.WARNING)
+
+    input_file = sys.stdin if args["input"] == "-" else open(args["input"])
+    output_file = open(args["output"], "w") if args["output"] else sys.stdout
+    try:
+        error_count = 0
+        for output in iter_results(input_file, args["processes"], args["max_in_flight"]):
+            error_count += "error" in output
+            output_file.write(json.dumps(output) + "\n")
+            output_file.flush()
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    if error_count:
+        LOG.warning(f"{error_count} snapshot(s) could not be processed.")
+
+if __name__ == "__main__":
+    main()
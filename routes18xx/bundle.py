@@ -0,0 +1,182 @@
+"""
+Compiles a game's data directory into a single pre-parsed bundle.
+
+A bundle holds the parsed contents of every JSON file in a game's data
+directory, plus the entries of the global tiles database that the game uses.
+Bundles are stored as JSON in a cache directory, which only its owner can
+access, and are recompiled whenever any of their source files change.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+_DIR_NAME = "data"
+_DATA_ROOT_DIR = os.path.abspath(os.path.normpath(os.path.join(os.path.dirname(__file__), _DIR_NAME)))
+
+_TILE_DB_FILENAME = "tiles-db.json"
+_GAME_TILES_FILENAME = "tiles.json"
+_REQUIRED_FILENAMES = ("game.json", "base-board.json", "railroads.json", "tiles.json", "trains.json")
+
+# Bump this whenever the layout of a bundle changes.
+_BUNDLE_FORMAT = 2
+
+CACHE_DIR_ENV_VAR = "ROUTES18XX_CACHE_DIR"
+
+
+class GameBundle:
+    def __init__(self, game_name, data, global_data, sources):
+        self.game_name = game_name
+        self.data = data
+        self.global_data = global_data
+        self.sources = sources
+
+    def get_data(self, filename):
+        try:
+            return self.data[filename]
+        except KeyError:
+            raise ValueError(f"{self.game_name} does not define {filename}.")
+
+    def get_global_data(self, filename):
+        try:
+            return self.global_data[filename]
+        except KeyError:
+            raise ValueError(f"{self.game_name} does not use the global data file {filename}.")
+
+    def is_stale(self):
+        return self.sources != get_source_stamps(self.game_name)
+
+
+def get_cache_dir():
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR)
+    if cache_dir is not None:
+        return cache_dir or None
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "routes18xx")
+
+def get_game_names():
+    return sorted(name for name in os.listdir(_DATA_ROOT_DIR) if os.path.isdir(os.path.join(_DATA_ROOT_DIR, name)))
+
+def _get_game_dir(game_name):
+    game_dir = os.path.join(_DATA_ROOT_DIR, game_name)
+    if not os.path.isdir(game_dir):
+        raise ValueError(f"No data was found for the requested game: {game_name}")
+    return game_dir
+
+def _get_source_filepaths(game_name):
+    game_dir = _get_game_dir(game_name)
+    game_filepaths = [os.path.join(game_dir, filename) for filename in sorted(os.listdir(game_dir)) if filename.endswith(".json")]
+    return game_filepaths + [os.path.join(_DATA_ROOT_DIR, _TILE_DB_FILENAME)]
+
+def get_source_stamps(game_name):
+    stamps = {}
+    for filepath in _get_source_filepaths(game_name):
+        stat = os.stat(filepath)
+        stamps[filepath] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+def _get_bundle_filepath(cache_dir, game_name):
+    return os.path.join(cache_dir, f"{game_name}.bundle")
+
+def _validate(game_name, data, tiles_db_json):
+    missing = [filename for filename in _REQUIRED_FILENAMES if filename not in data]
+    if missing:
+        raise ValueError(f"{game_name} is missing the following data files: {', '.join(missing)}")
+
+    unknown_tiles = [tile_id for tile_id in data[_GAME_TILES_FILENAME] if tile_id not in tiles_db_json]
+    if unknown_tiles:
+        raise ValueError(f"{game_name} uses tiles missing from {_TILE_DB_FILENAME}: {', '.join(unknown_tiles)}")
+
+def compile_bundle(game_name):
+    sources = get_source_stamps(game_name)
+
+    data = {}
+    tiles_db_json = None
+    for filepath in sources:
+        with open(filepath) as data_file:
+            if os.path.basename(filepath) == _TILE_DB_FILENAME and os.path.dirname(filepath) == _DATA_ROOT_DIR:
+                tiles_db_json = json.load(data_file)
+            else:
+                data[os.path.basename(filepath)] = json.load(data_file)
+
+    _validate(game_name, data, tiles_db_json)
+
+    # Only keep the tiles this game uses, to keep the bundle small.
+    global_data = {_TILE_DB_FILENAME: {tile_id: tiles_db_json[tile_id] for tile_id in data[_GAME_TILES_FILENAME]}}
+    return GameBundle(game_name, data, global_data, sources)
+
+def _read_bundle(bundle_filepath):
+    try:
+        with open(bundle_filepath) as bundle_file:
+            bundle_json = json.load(bundle_file)
+        if bundle_json["format"] != _BUNDLE_FORMAT:
+            return None
+        # JSON has no tuples, so the stamps come back as lists.
+        sources = {filepath: tuple(stamp) for filepath, stamp in bundle_json["sources"].items()}
+        return GameBundle(bundle_json["game_name"], bundle_json["data"], bundle_json["global_data"], sources)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def write_bundle(bundle, cache_dir):
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+    bundle_json = {
+        "format": _BUNDLE_FORMAT,
+        "game_name": bundle.game_name,
+        "data": bundle.data,
+        "global_data": bundle.global_data,
+        "sources": bundle.sources
+    }
+
+    # Write to a temporary file first, so concurrent readers never see a partial bundle.
+    fd, temp_filepath = tempfile.mkstemp(dir=cache_dir, prefix=f".{bundle.game_name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as bundle_file:
+            json.dump(bundle_json, bundle_file, separators=(",", ":"))
+        os.replace(temp_filepath, _get_bundle_filepath(cache_dir, bundle.game_name))
+    except BaseException:
+        os.unlink(temp_filepath)
+        raise
+
+def load(game_name):
+    """
+    Returns the bundle for the requested game, compiling and caching it if the
+    cached copy is missing or stale. If the cache directory is disabled or not
+    writable, the freshly compiled bundle is returned without being cached.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir:
+        bundle = _read_bundle(_get_bundle_filepath(cache_dir, game_name))
+        if bundle and not bundle.is_stale():
+            return bundle
+
+    bundle = compile_bundle(game_name)
+    if cache_dir:
+        try:
+            write_bundle(bundle, cache_dir)
+        except OSError:
+            pass
+    return bundle
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compile game data into fast-loading bundles.")
+    parser.add_argument("games", nargs="*",
+            help="The names of the games to compile. Defaults to every available game.")
+    parser.add_argument("-d", "--cache-dir",
+            help=f"The directory to write bundles to. Defaults to ${CACHE_DIR_ENV_VAR}, or the user cache directory.")
+    return vars(parser.parse_args())
+
+def main():
+    args = parse_args()
+
+    cache_dir = args["cache_dir"] or get_cache_dir()
+    if not cache_dir:
+        raise ValueError(f"No cache directory is available. Set {CACHE_DIR_ENV_VAR} or provide --cache-dir.")
+
+    for game_name in args["games"] or get_game_names():
+        write_bundle(compile_bundle(game_name), cache_dir)
+        print(f"{game_name}: {_get_bundle_filepath(cache_dir, game_name)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Cooperative cancellation of route calculations.
+
+A CancelToken is passed into a calculation, and can be cancelled from any thread. The calculation checks it regularly
+(including inside worker processes) and raises Cancelled soon after the token is cancelled.
+"""
+import threading
+
+
+class Cancelled(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def is_set(self):
+        """Lets a token stand in for an Event, wherever the calculation runs in this process."""
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+class CancelCheck:
+    """
+    Checks a cancel event (a CancelToken, or an Event shared with worker processes) every interval calls, since
+    checking a shared event is far more expensive than the work done between checks.
+    """
+    def __init__(self, event, interval=256):
+        self.event = event
+        self.interval = interval
+        self._count = 0
+
+    def __call__(self):
+        self._count += 1
+        if self._count % self.interval == 0 and self.event.is_set():
+            raise Cancelled()
@@ -1,5 +1,3 @@
-import json
-
 BASE_BOARD_FILENAME = "base-board.json"
 
 class Cell(object):
@@ -52,8 +50,7 @@ class Cell(object):
 
 def load(game):
     cell_grid = {}
-    with open(game.get_data_file(BASE_BOARD_FILENAME)) as board_file:
-        boundaries_json = json.load(board_file)["boundaries"]
+    boundaries_json = game.load_data(BASE_BOARD_FILENAME)["boundaries"]
 
     for row, col_ranges in boundaries_json.items():
         cell_grid[row] = {}
@@ -1,79 +1,110 @@
 import argparse
 import functools
 import itertools
+import json
 import logging
 import math
 import multiprocessing
 import os
 import queue
 import sys
+import time
 
-from routes18xx import boardstate, railroads
+from routes18xx import boardstate, boardtile, placedtile, railroads, tracing
 from routes18xx.board import Board
+from routes18xx.cancellation import CancelCheck
 from routes18xx.game import Game
 from routes18xx.route import RouteSet, Route
+from routes18xx.routestore import RouteStore, spill_if_configured
+from routes18xx.stats import RouteStats
+from routes18xx.tracing import TRACER
 
 LOG = logging.getLogger("routes18xx")
 
-def _is_overlapping(active_route, routes_to_check):
-    return any(True for route in routes_to_check if active_route.overlap(route)) if routes_to_check else False
+# How often (in seconds) to check for cancellation while waiting on the workers.
+_CANCEL_POLL_INTERVAL = 0.1
 
-def _find_high_potential_route_sets(game, railroad, threshhold_value, sorted_routes, selected_routes=None):
+# A railroad with no stations, used to check whether a stop is passable regardless of the railroad.
+_NO_RAILROAD = railroads.Railroad.create("", [])
+
+# Returned by a walk which continued, but kept none of its routes. They were either left to the walks from their other
+# ends (see _is_reverse_walk()), or pruned by the game (see Game.walk_pruner()).
+_CONTINUED = Route.empty()
+
+def _find_high_potential_route_sets(game, railroad, threshhold_value, store, sorted_routes, selected_routes=None, used_edges=0):
     selected_routes = selected_routes or []
 
     high_potential_route_sets = []
     for minor_route in sorted_routes[0]:
-        if not _is_overlapping(minor_route, selected_routes):
+        minor_edges = store.edges(minor_route)
+        if not minor_edges & used_edges:
             if sorted_routes[1:]:
                 max_possible_route_set = selected_routes + [minor_route] + [routes[0] for routes in sorted_routes[1:]]
-                max_possible_route_set_value = sum(game.hook_route_max_value(route, railroad) for route in max_possible_route_set)
+                max_possible_route_set_value = sum(store.max_value(route) for route in max_possible_route_set)
                 if max_possible_route_set_value <= threshhold_value:
                     return high_potential_route_sets
 
-                high_potential_route_sets.extend(_find_high_potential_route_sets(game, railroad, threshhold_value, sorted_routes[1:], selected_routes + [minor_route]))
+                high_potential_route_sets.extend(_find_high_potential_route_sets(game, railroad, threshhold_value, store, sorted_routes[1:],
+                        selected_routes + [minor_route], used_edges | minor_edges))
             else:
                 route_set = selected_routes + [minor_route]
-                route_set_value = sum(game.hook_route_max_value(route, railroad) for route in route_set)
+                route_set_value = sum(store.max_value(route) for route in route_set)
                 if route_set_value >= threshhold_value:
-                    high_potential_route_sets.append(RouteSet.create(game, railroad, route_set))
+                    high_potential_route_sets.append(store.route_set(game, railroad, route_set))
                 else:
                     return high_potential_route_sets
     return high_potential_route_sets
 
-def _find_best_sub_route_set(game, railroad, global_best_value, sorted_routes, selected_routes=None):
+def _find_best_sub_route_set(game, railroad, global_best_value, store, sorted_routes, selected_routes=None, used_edges=0, stats=None, cancel_check=None):
+    """
+    Routes are referred to by their index in the store. used_edges is the bitmask of the edges the selected routes
+    use (see RouteStore.edges()), since no two routes in a set can share an edge.
+    """
     selected_routes = selected_routes or []
+    if stats:
+        stats.count("search_nodes")
+    if cancel_check:
+        cancel_check()
 
-    best_route_set = RouteSet.create(game, railroad, selected_routes)
+    best_route_set = store.route_set(game, railroad, selected_routes)
     if best_route_set > global_best_value.value:
         global_best_value.value = best_route_set.value
 
     for minor_route in sorted_routes[0]:
-        if not _is_overlapping(minor_route, selected_routes):
+        minor_edges = store.edges(minor_route)
+        if not minor_edges & used_edges:
             if sorted_routes[1:]:
                 # Already selected routes + the current route + the maximum possible value of the remaining train routes.
-                max_possible_route_set = RouteSet.create(game, railroad, selected_routes + [minor_route] + [routes[0] for routes in sorted_routes[1:]])
+                max_possible_route_set = store.route_set(game, railroad, selected_routes + [minor_route] + [routes[0] for routes in sorted_routes[1:]])
                 # That must be more than the current best route set value, or we bail from this iteration.
                 if max_possible_route_set <= global_best_value.value:
+                    if stats:
+                        stats.count("search_pruned")
                     return best_route_set
 
-                sub_route_set = _find_best_sub_route_set(game, railroad, global_best_value, sorted_routes[1:], selected_routes + [minor_route])
+                sub_route_set = _find_best_sub_route_set(game, railroad, global_best_value, store, sorted_routes[1:], selected_routes + [minor_route],
+                        used_edges | minor_edges, stats, cancel_check)
                 if sub_route_set >= global_best_value.value:
                     best_route_set = sub_route_set
                     global_best_value.value = sub_route_set.value
             else:
-                return RouteSet.create(game, railroad, selected_routes + [minor_route])
+                return store.route_set(game, railroad, selected_routes + [minor_route])
     return best_route_set
 
-def _find_best_sub_route_set_worker(game, railroad, input_queue, global_best_value):
+def _find_best_sub_route_set_worker(game, railroad, store, input_queue, global_best_value, cancel_event=None):
     best_route_sets = []
-    while True:
-        try:
-            sorted_routes = input_queue.get_nowait()
-            best_route_set = _find_best_sub_route_set(game, railroad, global_best_value, sorted_routes)
-            if best_route_set:
-                best_route_sets.append(best_route_set)
-        except queue.Empty:
-            return best_route_sets
+    stats = RouteStats()
+    cancel_check = CancelCheck(cancel_event) if cancel_event else None
+    with stats.phase("worker"):
+        while True:
+            try:
+                sorted_routes = input_queue.get_nowait()
+                best_route_set = _find_best_sub_route_set(game, railroad, global_best_value, store, sorted_routes, stats=stats, cancel_check=cancel_check)
+                if best_route_set:
+                    best_route_sets.append(best_route_set)
+            except queue.Empty:
+                break
+    return best_route_sets, stats
 
 def _get_train_sets(railroad):
     train_sets = []
@@ -89,44 +120,157 @@ def chunk_sequence(sequence, chunk_length):
         yield sequence[index:index + chunk_length]
 
 
-def _get_route_sets(game, railroad, route_by_train):
-    manager = multiprocessing.Manager()
-    input_queue = manager.Queue()
+class WorkerPool:
+    """
+    A process pool, along with the manager which lets its workers share state. Creating both is expensive, so a single
+    WorkerPool can be passed to (and reused by) any number of route searches.
+    """
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count()
+        self.manager = multiprocessing.Manager()
+        self.pool = multiprocessing.Pool(processes=self.processes, initializer=tracing.init_worker, initargs=(TRACER.filepath, ))
 
-    sorted_routes_by_train = {train: sorted(routes, key=lambda route: route.value, reverse=True) for train, routes in route_by_train.items()}
+    def get_cancel_event(self, cancel_token):
+        """Returns an event which the workers can check. The caller must set it once the token is cancelled."""
+        return self.manager.Event()
 
-    proc_count = os.cpu_count()
-    best_route_sets = []
-    with multiprocessing.Pool(processes=proc_count) as pool:
-        # Using half the processes as workers seems to result in faster processing times.
-        worker_count = proc_count / 2
-        for train_set in _get_train_sets(railroad):
-            sorted_routes = [sorted_routes_by_train[train] for train in train_set]
-
-            if all(sorted_routes):
-                # Cut routes into 1 chunk per worker and put it on the queue
-                chunk_size = math.ceil(len(sorted_routes[0]) / worker_count)
-                for root_routes in chunk_sequence(sorted_routes[0], chunk_size):
-                    input_queue.put_nowait([root_routes] + sorted_routes[1:])
-    
-                # Allow the workers to compare notes on what the best route value is
-                global_best_value = manager.Value('i', 0)
-    
-                # Give each worker the input queue and the best value reference
-                worker_promises = []
-                for k in range(math.ceil(worker_count)):
-                    promise = pool.apply_async(_find_best_sub_route_set_worker, (game, railroad, input_queue, global_best_value))
-                    worker_promises.append(promise)
-        
-                # Add the results to the list
-                for promise in worker_promises:
-                    best_route_sets.extend(promise.get())
+    def close(self):
+        self.pool.terminate()
+        self.manager.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class _SerialValue:
+    def __init__(self, value):
+        self.value = value
+
+
+class _SerialManager:
+    def Queue(self):
+        return queue.Queue()
+
+    def Value(self, typecode, value):
+        return _SerialValue(value)
+
+
+class _SerialResult:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self, timeout=None):
+        return self.value
+
+
+class _SerialPool:
+    def apply_async(self, func, args=()):
+        return _SerialResult(func(*args))
+
+    def imap_unordered(self, func, iterable):
+        return map(func, iterable)
+
+
+class SerialWorkerPool:
+    """
+    A stand-in for WorkerPool which runs everything in the current process. Used where the caller is already a pool
+    worker (which can't start its own pool), or where the overhead of a pool outweighs its benefit.
+    """
+    processes = 1
+
+    def __init__(self):
+        self.manager = _SerialManager()
+        self.pool = _SerialPool()
+
+    def get_cancel_event(self, cancel_token):
+        # Everything runs in this process, so the token can be checked directly.
+        return cancel_token
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def _wait_for_worker(promise, cancel_token, cancel_event):
+    if not cancel_token:
+        return promise.get()
+
+    while True:
+        try:
+            return promise.get(timeout=_CANCEL_POLL_INTERVAL)
+        except multiprocessing.TimeoutError:
+            if cancel_token.is_cancelled:
+                # Tell the workers to stop, then wait for them to notice.
+                cancel_event.set()
 
+def _get_route_sets(game, railroad, store, worker_pool=None, seed_route_set=None, stats=None, progress=None, cancel_token=None):
+    if not worker_pool:
+        with WorkerPool() as worker_pool:
+            return _get_route_sets(game, railroad, store, worker_pool, seed_route_set, stats, progress, cancel_token)
+
+    stats = stats or RouteStats()
+    stats.worker_processes = worker_pool.processes
+    cancel_event = worker_pool.get_cancel_event(cancel_token) if cancel_token else None
+
+    input_queue = worker_pool.manager.Queue()
+
+    sorted_routes_by_train = {train: store.sorted_routes(train) for train in store.trains}
+
+    train_sets = _get_train_sets(railroad)
+    if not train_sets:
+        # A railroad without trains can't run any routes.
+        return [RouteSet.create(game, railroad, [])]
+
+    best_route_sets = []
+    # Using half the processes as workers seems to result in faster processing times.
+    worker_count = worker_pool.processes / 2
+    for train_set_index, train_set in enumerate(train_sets):
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+
+        sorted_routes = [sorted_routes_by_train[train] for train in train_set]
+
+        if all(sorted_routes):
+            stats.count("train_sets")
+
+            # Cut routes into 1 chunk per worker and put it on the queue
+            chunk_size = math.ceil(len(sorted_routes[0]) / worker_count)
+            for root_routes in chunk_sequence(sorted_routes[0], chunk_size):
+                input_queue.put_nowait([root_routes] + sorted_routes[1:])
+
+            # Allow the workers to compare notes on what the best route value is. A known route set lets them prune
+            # anything which can't beat it right away.
+            global_best_value = worker_pool.manager.Value('i', seed_route_set.value if seed_route_set else 0)
+
+            # Give each worker the input queue and the best value reference
+            worker_promises = []
+            for k in range(math.ceil(worker_count)):
+                promise = worker_pool.pool.apply_async(_find_best_sub_route_set_worker, (game, railroad, store, input_queue, global_best_value, cancel_event))
+                worker_promises.append(promise)
+
+            # Add the results to the list
+            for promise in worker_promises:
+                worker_route_sets, worker_stats = _wait_for_worker(promise, cancel_token, cancel_event)
+                best_route_sets.extend(worker_route_sets)
+                stats.merge(worker_stats)
+
+        if progress:
+            progress("search", (train_set_index + 1) / len(train_sets))
+
+    if seed_route_set:
+        best_route_sets.append(seed_route_set)
     best_route_set = max(best_route_sets, default=RouteSet.create(game, railroad, []))
 
-    LOG.debug("Threshold route set:")
-    for run_route in best_route_set:
-        LOG.debug(f"{run_route.train}: {run_route} ({run_route.value})")
+    if TRACER.enabled:
+        TRACER.event("threshold_route_set", "Threshold route set: {value}", value=best_route_set.value)
+        for run_route in best_route_set:
+            _trace_route("threshold_route", run_route)
 
     # Some games have adjustments that get applied to some routes in a route set.
     # Ideally, we'd determine the correct value of every possible route set
@@ -137,19 +281,22 @@ def _get_route_sets(game, railroad, route_by_train):
     # that exceeds (or matches) the threshhold value (the value of best_route_set),
     # and if it does, capture its actual value. All route sets whose max value
     # meets this threshhold are returned.
-    key_func = lambda route: game.hook_route_max_value(route, railroad)
-    sorted_routes_by_stops = [sorted(sorted_route_column, key=key_func, reverse=True) for sorted_route_column in sorted_routes]
-    high_potential_route_sets = _find_high_potential_route_sets(game, railroad, best_route_set.value, sorted_routes_by_stops)
+    with stats.phase("adjustment"):
+        sorted_routes_by_stops = [sorted(sorted_route_column, key=store.max_value, reverse=True) for sorted_route_column in sorted_routes]
+        high_potential_route_sets = _find_high_potential_route_sets(game, railroad, best_route_set.value, store, sorted_routes_by_stops)
+    stats.count("high_potential_route_sets", len(high_potential_route_sets))
     return [best_route_set] + high_potential_route_sets
 
-def _find_best_routes_by_train(game, route_by_train, railroad):
-    route_sets = _get_route_sets(game, railroad, route_by_train)
+def _find_best_routes_by_train(game, route_by_train, railroad, worker_pool=None, seed_route_set=None, stats=None, progress=None, cancel_token=None):
+    """route_by_train is either a RouteStore, or a dict of train => run routes."""
+    store = route_by_train if isinstance(route_by_train, RouteStore) else RouteStore.from_run_routes(game, railroad, route_by_train)
+    route_sets = _get_route_sets(game, railroad, store, worker_pool, seed_route_set, stats, progress, cancel_token)
 
-    LOG.debug(f"Found {len(route_sets)} route sets.")
-    for route_set in route_sets:
-        for run_route in route_set:
-            LOG.debug(f"{run_route.train}: {str(run_route)} ({run_route.value})")
-        LOG.debug("")
+    if TRACER.enabled:
+        TRACER.event("route_sets", "Found {count} route sets.", count=len(route_sets))
+        for index, route_set in enumerate(route_sets):
+            for run_route in route_set:
+                _trace_route("route_set_route", run_route, route_set=index)
 
     return max(route_sets, default=RouteSet.create(game, railroad, []))
 
@@ -157,9 +304,46 @@ def _get_subroutes(routes, stations):
     subroutes = [route.subroutes(station.cell) for station in stations for route in routes]
     return set(itertools.chain.from_iterable([subroute for subroute in subroutes if subroute]))
 
-def _walk_routes(game, board, railroad, enter_from, cell, length, visited_paths=None, visited_stops=None):
+def _trace_route(name, run_route, **fields):
+    TRACER.event(name, "{train}: {route} ({value})", train=run_route.train, route=run_route, value=run_route.value, **fields)
+
+def _trace_walk_leaf(visited_paths, enter_from, cell):
+    cells = [path[0] for path in visited_paths] + ([enter_from] if enter_from else []) + [cell]
+    TRACER.event("walk_leaf", "- {cells}", cells=cells)
+
+def _is_reverse_walk(tile, visited_stops):
+    """
+    Whether the route a walk ends at the tile with is also found, reversed, by the walk starting from the tile. Only
+    the walk from the lower of the two cells keeps it. A route is walked the same way in both directions, except
+    through a split city, where the exits which can be passed depend on the one it was entered from.
+    """
+    return bool(visited_stops) and tile.cell < visited_stops[0].cell \
+            and not any(isinstance(stop, (placedtile.SplitCity, boardtile.SplitCity)) for stop in visited_stops[1:])
+
+def _walk_routes(game, board, railroad, enter_from, cell, length, visited_paths=None, visited_stops=None, touched_cells=None, stats=None, used_edges=0, roots=None, reverse_ends=None, prefixes=False, prune=None, cancel_check=None):
+    """
+    Walks every route starting from the cell. The walk steps from stop to stop, along the board's segments between
+    them (see Board.stop_segments()). used_edges is the bitmask of the edges the route has already used, since a
+    route can't reuse track.
+
+    roots is the set of cells which routes of the same length are also walked from. A route which runs out of stops at
+    one of them is only kept by one of the two walks, and the cells it was left to are added to reverse_ends.
+
+    If prefixes is set, the route to every later stop along the way is included too, not just the routes the walk ends
+    with. prune is the game's check for steps which only lead to invalid routes (see Game.walk_pruner()). Like routes
+    left to other walks, a pruned step still counts as continuing the walk, so the stop before it isn't made a route
+    on its own. cancel_check is called at every step, and raises Cancelled once the calculation is cancelled.
+    """
     visited_paths = visited_paths or []
     visited_stops = visited_stops or []
+    if stats:
+        stats.count("walk_nodes")
+    if cancel_check:
+        cancel_check()
+
+    # Record every cell whose space was looked at, since the walk's result depends on each of them.
+    if touched_cells is not None:
+        touched_cells.add(cell)
 
     tile = board.get_space(cell)
     if not tile or (enter_from and enter_from not in tile.paths()) or tile in visited_stops:
@@ -168,10 +352,13 @@ def _walk_routes(game, board, railroad, enter_from, cell, length, visited_paths=
     if tile.is_stop \
             and (not game.rules.towns_omit_from_limit or not tile.is_town):
         if length - 1 == 0 or (enter_from and not tile.passable(enter_from, railroad)):
-            str_visited = [str(path[0]) for path in visited_paths] \
-                    + ([str(enter_from)] if enter_from else []) \
-                    + [str(tile.cell)]
-            LOG.debug(f"- {', '.join(str_visited)}")
+            if length - 1 == 0 and roots and tile.cell in roots and _is_reverse_walk(tile, visited_stops):
+                if reverse_ends is not None:
+                    reverse_ends.add(tile.cell)
+                return (_CONTINUED, )
+
+            if TRACER.enabled:
+                _trace_walk_leaf(visited_paths, enter_from, tile.cell)
             return (Route.single(tile), )
 
         remaining_stops = length - 1
@@ -181,23 +368,241 @@ def _walk_routes(game, board, railroad, enter_from, cell, length, visited_paths=
     neighbors = tile.paths(enter_from, railroad)
 
     routes = []
+    continued = False
     for neighbor in neighbors:
-        path = [tile.cell, neighbor]
-        if path not in visited_paths and list(reversed(path)) not in visited_paths:
-            neighbor_paths = _walk_routes(game, board, railroad, cell, neighbor, remaining_stops,
-                    visited_paths=visited_paths + ([path] if path else []),
-                    visited_stops=visited_stops + ([tile] if tile.is_stop else []))
-            routes += [Route.single(tile).merge(neighbor_path) for neighbor_path in neighbor_paths if neighbor_path]
-
-    if not routes and tile.is_stop:
-        str_visited = [str(path[0]) for path in visited_paths] \
-                + ([str(enter_from)] if enter_from else []) \
-                + [str(tile.cell)]
-        LOG.debug(f"- {', '.join(str_visited)}")
+        segments, segment_touched_cells = board.stop_segments(tile.cell, neighbor)
+        if touched_cells is not None:
+            touched_cells.update(segment_touched_cells)
+
+        for segment_spaces, segment_paths, segment_edges in segments:
+            if segment_edges & used_edges:
+                continue
+
+            segment_enter_from, segment_end = segment_paths[-1]
+            if prune:
+                next_stop = board.get_space(segment_end)
+                if prune(railroad, visited_stops[0] if visited_stops else tile, tile, enter_from, neighbor, next_stop):
+                    continued = continued or (next_stop is not tile and next_stop not in visited_stops)
+                    continue
+
+            neighbor_paths = _walk_routes(game, board, railroad, segment_enter_from, segment_end, remaining_stops,
+                    visited_paths=visited_paths + segment_paths,
+                    visited_stops=visited_stops + ([tile] if tile.is_stop else []),
+                    touched_cells=touched_cells,
+                    stats=stats,
+                    used_edges=used_edges | segment_edges,
+                    roots=roots,
+                    reverse_ends=reverse_ends,
+                    prefixes=prefixes,
+                    prune=prune,
+                    cancel_check=cancel_check)
+            if neighbor_paths[0] is _CONTINUED:
+                continued = True
+                continue
+            routes += [Route.create((tile, ) + segment_spaces + neighbor_path._path) for neighbor_path in neighbor_paths if neighbor_path]
+
+    # A stop whose routes were all left to other walks or pruned still continues, so it isn't a route on its own.
+    if not routes and continued and not (prefixes and visited_stops):
+        return (_CONTINUED, ) if visited_stops else ()
+    elif tile.is_stop and ((prefixes and visited_stops) or not routes):
+        if TRACER.enabled and not routes:
+            _trace_walk_leaf(visited_paths, enter_from, tile.cell)
         routes.append(Route.single(tile))
 
     return tuple(set(routes))
 
+def _walk_shared_routes(game, board, railroad_bits, enter_from, cell, length, mask, visited_stops=None, stats=None, used_edges=0, root_masks=None, prefixes=False, prune=None, cancel_check=None):
+    """
+    Walks every route starting from the cell for several railroads at once. Returns a dict of each route's path =>
+    [route, mask], where mask is a bitmask of the railroads which walk it. Each railroad's bit is given by
+    railroad_bits, a list of (railroad, bit) pairs. mask holds the railroads which are still walking.
+
+    The only stops whose passability depends on the railroad are full cities. A walk continues through one for the
+    railroads which have a station there, and ends there for every other railroad.
+
+    Routes are equal if they have the same tiles, but two railroads may only be able to run those tiles in different
+    orders (e.g. when one of them can't pass a full city), so routes are keyed by their path instead, and are only
+    merged when they run the same way.
+
+    root_masks maps each cell which routes of the same length are also walked from to the railroads which walk from
+    it. As in _walk_routes(), a route which runs out of stops at one of them is left to the walk from its other end.
+    The railroads it was left to are stored under the None key. prefixes, prune and cancel_check are the same as in
+    _walk_routes(), except that a step is only pruned for the railroads the game's check rejects it for.
+    """
+    visited_stops = visited_stops or []
+    if stats:
+        stats.count("walk_nodes")
+    if cancel_check:
+        cancel_check()
+
+    tile = board.get_space(cell)
+    if not tile or (enter_from and enter_from not in tile.paths()) or tile in visited_stops:
+        return {}
+
+    single_key = (tile, )
+    routes = {}
+    if tile.is_stop \
+            and (not game.rules.towns_omit_from_limit or not tile.is_town):
+        if length - 1 == 0 or (enter_from and tile.is_terminus):
+            reverse_mask = 0
+            if length - 1 == 0 and root_masks and _is_reverse_walk(tile, visited_stops):
+                reverse_mask = root_masks.get(tile.cell, 0) & mask
+            if not reverse_mask:
+                return {single_key: [Route.single(tile), mask]}
+
+            routes[None] = [None, reverse_mask]
+            if mask & ~reverse_mask:
+                routes[single_key] = [Route.single(tile), mask & ~reverse_mask]
+            return routes
+
+        if enter_from and not tile.passable(enter_from, _NO_RAILROAD):
+            blocked_mask = 0
+            for railroad, bit in railroad_bits:
+                if mask & bit and not tile.passable(enter_from, railroad):
+                    blocked_mask |= bit
+            if blocked_mask:
+                routes[single_key] = [Route.single(tile), blocked_mask]
+                mask &= ~blocked_mask
+
+        remaining_stops = length - 1
+    else:
+        remaining_stops = length
+
+    # Continued routes always have more tiles than the single stop route which a blocked walk ends with, so they're
+    # added to the same dict.
+    continued = False
+    if mask:
+        for neighbor in tile.paths(enter_from):
+            for segment_spaces, segment_paths, segment_edges in board.stop_segments(tile.cell, neighbor)[0]:
+                if segment_edges & used_edges:
+                    continue
+
+                segment_enter_from, segment_end = segment_paths[-1]
+                step_mask = mask
+                if prune:
+                    next_stop = board.get_space(segment_end)
+                    for railroad, bit in railroad_bits:
+                        if step_mask & bit and prune(railroad, visited_stops[0] if visited_stops else tile, tile, enter_from, neighbor, next_stop):
+                            step_mask &= ~bit
+                    if not step_mask:
+                        if next_stop is not tile and next_stop not in visited_stops:
+                            continued = True
+                            routes.setdefault(None, [None, 0])
+                        continue
+
+                neighbor_paths = _walk_shared_routes(game, board, railroad_bits, segment_enter_from, segment_end, remaining_stops, step_mask,
+                        visited_stops=visited_stops + ([tile] if tile.is_stop else []),
+                        stats=stats,
+                        used_edges=used_edges | segment_edges,
+                        root_masks=root_masks,
+                        prefixes=prefixes,
+                        prune=prune,
+                        cancel_check=cancel_check)
+                prefix = (tile, ) + segment_spaces
+                for neighbor_key, (neighbor_path, neighbor_mask) in neighbor_paths.items():
+                    continued = True
+                    # Keep the routes left to other walks, so the stops before this one know it continued.
+                    if neighbor_key is None:
+                        routes.setdefault(None, [None, 0])[1] |= neighbor_mask
+                        continue
+
+                    key = prefix + neighbor_key
+                    if key in routes:
+                        routes[key][1] |= neighbor_mask
+                    else:
+                        routes[key] = [Route.create(key), neighbor_mask]
+
+    # A stop with nowhere to go is a route on its own, for every railroad which reached it. So is every stop after the
+    # first, if prefixes are wanted.
+    if tile.is_stop and ((prefixes and visited_stops) or not continued):
+        routes[single_key] = [Route.single(tile), mask | routes.get(single_key, [None, 0])[1]]
+
+    return routes
+
+
+class _SharedWalks:
+    """
+    A walk cache shared by several railroads on one board. Each walk is done once for all the railroads (see
+    _walk_shared_routes()), and each railroad's routes are picked out of it by its bit.
+    """
+    def __init__(self, game, board, railroads):
+        self.game = game
+        self.board = board
+        self._railroad_bits = [(railroad, 1 << index) for index, railroad in enumerate(railroads)]
+        self._bit_by_name = {railroad.name: bit for railroad, bit in self._railroad_bits}
+        self._all_mask = (1 << len(self._railroad_bits)) - 1
+        # (start cell, stop count, prefixes) => ([(route, railroad mask), ...], mask of the railroads routes were left to roots for)
+        self._walks = {}
+        # stop count => {root cell => railroad mask}
+        self._root_masks = {}
+        # stop count => {railroad name => reachable cells}
+        self._reachable = {}
+        self._game_prune = game.walk_pruner(board)
+
+    def routes(self, railroad, cell, length, stats=None, roots=None, prefixes=False, reachable=None, cancel_check=None):
+        """
+        If roots are given, routes between them are only returned by the walk from one end. If reachable cells are
+        given, the railroad's routes don't step to stops outside them. A railroad's roots and reachable cells are
+        recorded before its first walk, and walks done before that keep every route for it. Without roots, a walk which
+        left any of the railroad's routes to its roots, or didn't step somewhere for it, is redone.
+        """
+        bit = self._bit_by_name[railroad.name]
+        if roots is not None:
+            root_masks = self._root_masks.setdefault(length, {})
+            for root in roots:
+                root_masks[root] = root_masks.get(root, 0) | bit
+            if reachable is not None:
+                self._reachable.setdefault(length, {})[railroad.name] = reachable
+        else:
+            root_masks = None
+
+        key = (cell, length, prefixes)
+        if key not in self._walks or (root_masks is None and self._walks[key][1] & bit):
+            unreachable_mask = [0]
+            routes = _walk_shared_routes(self.game, self.board, self._railroad_bits, None, cell, length, self._all_mask, stats=stats,
+                    root_masks=root_masks, prefixes=prefixes, prune=self._get_prune(length, unreachable_mask) if root_masks else self._game_prune,
+                    cancel_check=cancel_check)
+            reverse_mask = routes.pop(None, [None, 0])[1]
+            self._walks[key] = ([(route, mask) for route, mask in routes.values()], reverse_mask | unreachable_mask[0])
+
+        return tuple(route for route, mask in self._walks[key][0] if mask & bit)
+
+    def _get_prune(self, length, unreachable_mask):
+        """
+        Returns the check for steps a walk with roots should skip, for each railroad. The railroads with steps skipped
+        because they can't reach the next stop are added to unreachable_mask[0].
+        """
+        reachable_by_name = self._reachable.get(length)
+        if not reachable_by_name:
+            return self._game_prune
+
+        game_prune = self._game_prune
+        def prune(railroad, first_stop, stop, enter_from, exit_cell, next_stop):
+            reachable = reachable_by_name.get(railroad.name)
+            if reachable is not None and next_stop.cell not in reachable:
+                unreachable_mask[0] |= self._bit_by_name[railroad.name]
+                return True
+            return bool(game_prune) and game_prune(railroad, first_stop, stop, enter_from, exit_cell, next_stop)
+        return prune
+
+
+def _get_walk_pruner(game, board, reachable=None, unreachable_ends=None):
+    """
+    Returns the check for steps a walk should skip. Those are the steps the game prunes (see Game.walk_pruner()),
+    and, if reachable cells are given, the steps to stops outside them, which are added to unreachable_ends.
+    """
+    game_prune = game.walk_pruner(board)
+    if reachable is None:
+        return game_prune
+
+    def prune(railroad, first_stop, stop, enter_from, exit_cell, next_stop):
+        if next_stop.cell not in reachable:
+            if unreachable_ends is not None:
+                unreachable_ends.add(next_stop.cell)
+            return True
+        return bool(game_prune) and game_prune(railroad, first_stop, stop, enter_from, exit_cell, next_stop)
+    return prune
+
 def _filter_invalid_routes(game, routes, board, railroad):
     """
     Given a collection of routes, returns a new set containing only valid routes. Invalid routes removed:
@@ -229,59 +634,177 @@ def _filter_invalid_routes(game, routes, board, railroad):
 
     return game.filter_invalid_routes(valid_routes, board, railroad)
 
-def _find_routes_from_cell(game, board, railroad, cell, train):
-    routes = _walk_routes(game, board, railroad, None, cell, train.visit)
+def _is_walk_reusable(walk, roots, reachable):
+    routes, touched_cells, reverse_ends, unreachable_ends = walk
+    if not reverse_ends <= (roots or frozenset()):
+        return False
+    return not unreachable_ends if reachable is None else unreachable_ends.isdisjoint(reachable)
 
-    LOG.debug(f"Found {len(routes)} routes starting at {cell}.")
+def _walk_routes_from_cell(game, board, railroad, cell, length, walk_cache=None, stats=None, roots=None, prefixes=False, reachable=None, cancel_check=None):
+    """
+    Walks every route starting from the cell. If reachable cells are given (see Board.reachable_cells()), the walk
+    doesn't step to stops outside them.
+
+    If a walk cache is provided, the result is looked up in, or added to, the cache. Each cache entry also records the
+    cells the walk touched, so it can be invalidated when one changes, the roots it left routes to, so it's only reused
+    when those are walked from too, and the stops it didn't step to, so it's only reused when those still can't be
+    reached.
+    """
+    if walk_cache is None:
+        return _walk_routes(game, board, railroad, None, cell, length, stats=stats, roots=roots, prefixes=prefixes,
+                prune=_get_walk_pruner(game, board, reachable), cancel_check=cancel_check)
+    elif isinstance(walk_cache, _SharedWalks):
+        return walk_cache.routes(railroad, cell, length, stats, roots, prefixes, reachable, cancel_check)
+
+    key = (cell, length, prefixes)
+    if key not in walk_cache or not _is_walk_reusable(walk_cache[key], roots, reachable):
+        touched_cells = set()
+        reverse_ends = set()
+        unreachable_ends = set()
+        routes = _walk_routes(game, board, railroad, None, cell, length, touched_cells=touched_cells, stats=stats, roots=roots,
+                reverse_ends=reverse_ends, prefixes=prefixes, prune=_get_walk_pruner(game, board, reachable, unreachable_ends),
+                cancel_check=cancel_check)
+        walk_cache[key] = (routes, touched_cells, reverse_ends, unreachable_ends)
+    return walk_cache[key][0]
+
+def _find_routes_from_cell(game, board, railroad, cell, train, walk_cache=None, stats=None, roots=None, prefixes=False, reachable=None, cancel_check=None):
+    routes = _walk_routes_from_cell(game, board, railroad, cell, train.visit, walk_cache, stats, roots, prefixes, reachable, cancel_check)
+
+    TRACER.event("routes_from_cell", "Found {count} routes starting at {cell}.", count=len(routes), cell=cell)
     return routes
 
-def _find_connected_cities(game,board, railroad, cell, dist):
-    tiles = itertools.chain.from_iterable(_walk_routes(game, board, railroad, None, cell, dist))
+def _find_connected_cities(game,board, railroad, cell, dist, walk_cache=None, stats=None, cancel_check=None):
+    tiles = itertools.chain.from_iterable(_walk_routes_from_cell(game, board, railroad, cell, dist, walk_cache, stats, cancel_check=cancel_check))
     return {tile.cell for tile in tiles if tile.is_city or tile.is_terminus} - {cell}
 
-def _find_connected_routes(game, board, railroad, station, train):
-    LOG.debug("Finding connected cities.")
-    connected_cities = _find_connected_cities(game, board, railroad, station.cell, train.visit - 1)
-    LOG.debug(f"Connected cities: {', '.join([str(cell) for cell in connected_cities])}")
-
-    LOG.debug("Finding routes starting from connected cities.")
+def _find_connected_routes(game, board, railroad, connected_cities, train, walk_cache=None, stats=None, roots=None, reachable=None, cancel_check=None):
+    TRACER.event("find_connected_routes", "Finding routes starting from connected cities.")
     connected_routes = set()
     for cell in connected_cities:
-        connected_routes.update(_find_routes_from_cell(game, board, railroad, cell, train))
-    LOG.debug(f"Found {len(connected_routes)} routes from connected cities.")
+        connected_routes.update(_find_routes_from_cell(game, board, railroad, cell, train, walk_cache, stats, roots, reachable=reachable,
+                cancel_check=cancel_check))
+    TRACER.event("connected_routes", "Found {count} routes from connected cities.", count=len(connected_routes))
     return connected_routes
 
-def _find_all_routes(game, board, railroad):
+def _find_all_routes(game, board, railroad, walk_cache=None, stats=None, progress=None, cancel_token=None):
     LOG.info(f"Finding all possible routes for each train from {railroad.name}'s stations.")
 
+    stats = stats or RouteStats()
+    # Walks can take a long time late in the game, so they check for cancellation as they go.
+    cancel_check = CancelCheck(cancel_token) if cancel_token else None
+
     stations = board.stations(railroad.name)
 
     routes_by_train = {}
+    unique_trains = set(railroad.trains)
     for train in railroad.trains:
         if train not in routes_by_train:
-            routes = set()
+            connected_cities_by_station = {}
             for station in stations:
-                LOG.debug(f"Finding routes starting at station at {station.cell}.")
-                routes.update(_find_routes_from_cell(game, board, railroad, station.cell, train))
+                TRACER.event("find_connected_cities", "Finding connected cities.")
+                connected_cities_by_station[station.cell] = _find_connected_cities(game, board, railroad, station.cell, train.visit - 1, walk_cache, stats,
+                        cancel_check)
+                TRACER.event("connected_cities", "Connected cities: {cells}", cells=connected_cities_by_station[station.cell])
+
+            # Every route is walked from each end which is a station or connected city, so routes between two of them
+            # only need to be found from one end.
+            roots = frozenset(itertools.chain([station.cell for station in stations], *connected_cities_by_station.values()))
+            # A route with a stop the stations can't reach can't include a station, so the walks from connected cities
+            # don't step outside the reachable cells.
+            reachable = board.reachable_cells(railroad, train.visit, not game.rules.towns_omit_from_limit)
 
-                LOG.debug(f"Finding routes which pass through station at {station.cell}.")
-                connected_paths = _find_connected_routes(game, board, railroad, station, train)
+            routes = set()
+            for station_index, station in enumerate(stations):
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+
+                TRACER.event("find_station_routes", "Finding routes starting at station at {cell}.", cell=station.cell)
+                # The routes to each stop along the way are the station's subroutes.
+                routes.update(_find_routes_from_cell(game, board, railroad, station.cell, train, walk_cache, stats, roots, prefixes=True,
+                        cancel_check=cancel_check))
+
+                TRACER.event("find_through_routes", "Finding routes which pass through station at {cell}.", cell=station.cell)
+                connected_paths = _find_connected_routes(game, board, railroad, connected_cities_by_station[station.cell], train, walk_cache, stats,
+                        roots, reachable, cancel_check)
                 routes.update(connected_paths)
 
-            LOG.debug("Add subroutes")
-            routes.update(_get_subroutes(routes, stations))
+                if progress and station_index + 1 < len(stations):
+                    progress("enumeration", (len(routes_by_train) + (station_index + 1) / len(stations)) / len(unique_trains))
+
+            # The station walks found the subroutes which start at a station. Reversed, those are also the ones which end
+            # at a station, except through a split city, which may only be passable in one direction.
+            TRACER.event("add_subroutes", "Add subroutes through split cities")
+            with stats.phase("subroutes"):
+                split_city_routes = [route for route in routes
+                        if any(isinstance(stop, (placedtile.SplitCity, boardtile.SplitCity)) for stop in route.stops[1:-1])]
+                routes.update(_get_subroutes(split_city_routes, stations))
 
-            LOG.debug("Filtering out invalid routes")
-            routes_by_train[train] = _filter_invalid_routes(game, routes, board, railroad)
+            TRACER.event("filter_routes", "Filtering out invalid routes")
+            with stats.phase("filtering"):
+                routes_by_train[train] = _filter_invalid_routes(game, routes, board, railroad)
+            stats.count_routes(train, len(routes), len(routes_by_train[train]))
+
+            if progress:
+                progress("enumeration", len(routes_by_train) / len(unique_trains))
 
     LOG.info(f"Found {sum(len(route) for route in routes_by_train.values())} routes.")
-    for train, routes in routes_by_train.items():
-        for route in routes:
-            LOG.debug(f"{train}: {str(route)}")
+    if TRACER.enabled:
+        for train, routes in routes_by_train.items():
+            for route in routes:
+                TRACER.event("route", "{train}: {route}", train=train, route=route)
 
     return routes_by_train
 
-def find_best_routes(game, board, railroads, active_railroad):
+def _find_route_values_by_train(game, board, railroad, stats=None, progress=None, cancel_token=None):
+    stats = stats or RouteStats()
+    with stats.phase("enumeration"):
+        routes = _find_all_routes(game, board, railroad, stats=stats, progress=progress, cancel_token=cancel_token)
+
+    if cancel_token:
+        cancel_token.raise_if_cancelled()
+
+    return spill_if_configured(_run_routes_by_train(game, board, railroad, routes, stats))
+
+def _run_routes_by_train(game, board, railroad, routes, stats):
+    """Returns a RouteStore of each train's run routes. The run routes themselves aren't kept."""
+    LOG.info("Calculating route values.")
+    with stats.phase("valuation"):
+        store = RouteStore()
+        for train in routes:
+            store.add(game, railroad, train, (route.run(game, board, train, railroad) for route in routes[train]))
+    return store
+
+def _run_routes_by_train_worker(args):
+    index, game, board, railroad, routes, stats = args
+    return index, _run_routes_by_train(game, board, railroad, routes, stats), stats
+
+def _get_active_railroads(railroads, active_railroad_names=None):
+    if active_railroad_names is None:
+        # Nicknames map to the same railroad, so dedupe while preserving order.
+        active_railroads = {railroad.name: railroad for railroad in railroads.values() if not railroad.is_removed}
+        return list(active_railroads.values())
+
+    active_railroads = {}
+    for name in active_railroad_names:
+        if name not in railroads:
+            raise ValueError(f"Unrecognized railroad name: {name}")
+
+        railroad = railroads[name]
+        if railroad.is_removed:
+            raise ValueError(f"Cannot calculate routes for a removed railroad: {railroad.name}")
+        active_railroads[railroad.name] = railroad
+    return list(active_railroads.values())
+
+def find_best_routes(game, board, railroads, active_railroad, worker_pool=None, stats=None, progress=None, cancel_token=None):
+    """
+    Returns the active railroad's best route set. The time spent in each phase and the search's counters are recorded
+    in the route set's stats. If a RouteStats object is provided, they're recorded there instead.
+
+    If provided, progress is called with the name of the phase ("enumeration" or "search") and the fraction of it
+    which is complete, as each station's routes are enumerated, and after each train set is searched. If the
+    cancel_token is cancelled, the calculation (including any walk of the board, or work in the worker pool) stops, and
+    Cancelled is raised.
+    """
     if active_railroad.is_removed:
         raise ValueError(f"Cannot calculate routes for a removed railroad: {active_railroad.name}")
 
@@ -289,17 +812,69 @@ def find_best_routes(game, board, railroads, active_railroad):
 
     LOG.info(f"Finding the best route for {active_railroad.name}.")
 
-    routes = _find_all_routes(game, board, active_railroad)
+    stats = stats or RouteStats()
+    route_store = _find_route_values_by_train(game, board, active_railroad, stats, progress, cancel_token)
 
-    LOG.info("Calculating route values.")
-    route_value_by_train = {}
-    for train in routes:
-        route_value_by_train[train] = [route.run(game, board, train, active_railroad) for route in routes[train]]
+    with stats.phase("search"):
+        best_route_set = _find_best_routes_by_train(game, route_store, active_railroad, worker_pool, stats=stats,
+                progress=progress, cancel_token=cancel_token)
+    best_route_set.stats = stats
+    return best_route_set
+
+def iter_best_routes(game, board, railroads, active_railroad_names=None, worker_pool=None, cancel_token=None):
+    """
+    Finds the best routes for several railroads from a single board state, yielding (railroad, route set) pairs as
+    each one completes. Railroads are yielded in the order their routes finish being valued, not the requested
+    order. If no railroad names are given, every railroad in play is included.
+
+    The board is only walked once: every railroad's routes are picked out of the same railroad-agnostic walks (see
+    _SharedWalks). Route valuation for every railroad is spread across the worker pool. Each railroad's search then
+    uses the whole pool. The pool is shared across all railroads, rather than being created for each one.
 
-    return _find_best_routes_by_train(game, route_value_by_train, active_railroad)
+    If the cancel_token is cancelled, Cancelled is raised before the next railroad's search, or during it.
+    """
+    active_railroads = _get_active_railroads(railroads, active_railroad_names)
+
+    game.capture_phase(railroads)
 
-def find_best_routes_from_files(game, active_railroad_name, board_state_filename, railroads_filename, private_companies_filename=None):
-    game = Game.load(game)
+    if not worker_pool:
+        with WorkerPool() as worker_pool:
+            yield from iter_best_routes(game, board, railroads, active_railroad_names, worker_pool, cancel_token)
+        return
+
+    LOG.info(f"Finding the best routes for {', '.join(railroad.name for railroad in active_railroads)}.")
+
+    shared_walks = _SharedWalks(game, board, active_railroads)
+    valuation_args = []
+    for index, railroad in enumerate(active_railroads):
+        stats = RouteStats()
+        with stats.phase("enumeration"):
+            routes = _find_all_routes(game, board, railroad, shared_walks, stats, cancel_token=cancel_token)
+        # The board and railroad must be sent to the worker together, so the stations on the board refer to the same
+        # railroad object as the one being checked.
+        valuation_args.append((index, game, board, railroad, routes, stats))
+
+    valuation_results = worker_pool.pool.imap_unordered(_run_routes_by_train_worker, valuation_args)
+    for index, route_store, stats in valuation_results:
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+
+        # Spilled here, rather than in the worker, since the file is removed along with the store which wrote it.
+        spill_if_configured(route_store)
+        railroad = active_railroads[index]
+        LOG.info(f"Finding the best route for {railroad.name}.")
+        with stats.phase("search"):
+            best_route_set = _find_best_routes_by_train(game, route_store, railroad, worker_pool, stats=stats,
+                    cancel_token=cancel_token)
+        best_route_set.stats = stats
+        yield railroad, best_route_set
+
+def find_best_routes_batch(game, board, railroads, active_railroad_names=None, worker_pool=None):
+    """Like iter_best_routes(), but returns a dict of railroad name to best route set."""
+    return {railroad.name: route_set for railroad, route_set in iter_best_routes(game, board, railroads, active_railroad_names, worker_pool)}
+
+def load_from_files(game_name, board_state_filename, railroads_filename, private_companies_filename=None):
+    game = Game.load(game_name)
     board = boardstate.load_from_csv(game, board_state_filename)
     railroads_in_play = railroads.load_from_csv(game, board, railroads_filename)
     game.capture_phase(railroads_in_play)
@@ -309,45 +884,192 @@ def find_best_routes_from_files(game, active_railroad_name, board_state_filename
         private_companies_module.load_from_csv(game, board, railroads_in_play, private_companies_filename)
     board.validate()
 
-    active_railroad = railroads_in_play[active_railroad_name]
-    if active_railroad.is_removed:
-        raise ValueError(f"Cannot calculate routes for a removed railroad: {active_railroad.name}")
+    return game, board, railroads_in_play
+
+def load_from_rows(game_name, board_state_rows, railroads_rows, private_companies_rows=None):
+    """Like load_from_files(), but takes already parsed rows (dicts keyed by each file's field names)."""
+    game = Game.load(game_name)
+    board = boardstate.load(game, board_state_rows)
+    railroads_in_play = railroads.load(game, board, railroads_rows)
+    game.capture_phase(railroads_in_play)
 
+    private_companies_module = game.get_game_submodule("private_companies")
+    if private_companies_module:
+        private_companies_module.load(game, board, railroads_in_play, private_companies_rows)
+    board.validate()
+
+    return game, board, railroads_in_play
+
+def find_best_routes_from_files(game, active_railroad_name, board_state_filename, railroads_filename, private_companies_filename=None, result_cache=None):
+    """
+    Loads the state files, then finds the best routes for the active railroad. If a ResultCache is provided, the
+    result is looked up there first, and stored there if it wasn't found.
+    """
+    if result_cache:
+        results = result_cache.iter_best_routes_from_files(game, [active_railroad_name], board_state_filename, railroads_filename, private_companies_filename)
+        for railroad, route_set in results:
+            return route_set
+
+    game, board, railroads_in_play = load_from_files(game, board_state_filename, railroads_filename, private_companies_filename)
+
+    active_railroad, = _get_active_railroads(railroads_in_play, [active_railroad_name])
     return find_best_routes(game, board, railroads_in_play, active_railroad)
 
-def parse_args():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("game",
+def iter_best_routes_from_files(game, active_railroad_names, board_state_filename, railroads_filename, private_companies_filename=None, worker_pool=None, result_cache=None):
+    """
+    The batch version of find_best_routes_from_files(). The files are only loaded once, no matter how many railroads
+    are requested. If active_railroad_names is None, every railroad in play is included.
+    """
+    if result_cache:
+        yield from result_cache.iter_best_routes_from_files(game, active_railroad_names, board_state_filename, railroads_filename, private_companies_filename, worker_pool)
+        return
+
+    game, board, railroads_in_play = load_from_files(game, board_state_filename, railroads_filename, private_companies_filename)
+    yield from iter_best_routes(game, board, railroads_in_play, active_railroad_names, worker_pool)
+
+OUTPUT_FORMATS = ("text", "json", "ndjson")
+
+# The mode used when the first argument doesn't name one.
+_DEFAULT_MODE = "find"
+
+def parse_args(argv=None):
+    # The serve and bulk modes pull in modules the default mode never needs, so they're only imported here.
+    from routes18xx import bulk, server
+
+    parser = argparse.ArgumentParser(prog="calc-routes",
+            description=f"Find the best routes for 18xx railroads. The mode defaults to {_DEFAULT_MODE}, so it can be left out.")
+    modes = parser.add_subparsers(dest="mode", metavar="MODE")
+
+    find_parser = modes.add_parser(_DEFAULT_MODE, help="Find the best routes for one or more railroads in a board state.",
+            description="Find the best routes for one or more railroads in a board state.")
+    find_parser.add_argument("game",
             help="The name of the game to use. Usually just the \"year\" (e.g. 1846, 18AL, etc).")
-    parser.add_argument("active-railroad",
-            help="The name of the railroad for whom to find the route. Must be present in the railroads file.")
-    parser.add_argument("board-state-file",
+    find_parser.add_argument("active-railroads", nargs="*",
+            help=("The names of the railroads for whom to find routes. Each must be present in the railroads file. "
+                  "Every railroad is calculated from the same loaded board state."))
+    find_parser.add_argument("board-state-file",
             help=("CSV file containing the board state. Semi-colon is the column separator. The columns are: "
                   "coord; tile_id; orientation"))
-    parser.add_argument("railroads-file",
+    find_parser.add_argument("railroads-file",
             help=("CSV file containing railroads. Semi-colon is the column separator. The columns are: "
                   "name; trains (comma-separated); stations (comma-separated); station_branch_map (optional, repeating)"))
-    parser.add_argument("-p", "--private-companies-file",
+    find_parser.add_argument("-p", "--private-companies-file",
             help=("CSV file containing private company info. Semi-colon is the column separator. A column's precise "
                   "meaning depends on the company. The columns are: "
                   "name; owner; coordinate (optional)."))
-    parser.add_argument("-v", "--verbose", action="store_true")
-    return vars(parser.parse_args())
+    find_parser.add_argument("-a", "--all", action="store_true",
+            help="Find routes for every railroad in the railroads file which has not been removed or closed.")
+    find_parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="text",
+            help=("The output format. json writes one object per railroad (in an array, when finding routes for more "
+                  "than one railroad), and ndjson writes one object per line. Both are written as each railroad "
+                  "completes. Logs are written to stderr for either."))
+    find_parser.add_argument("--result-cache", metavar="DIR",
+            help=("Cache results in this directory, and reuse them whenever the same state is requested again. "
+                  "\"default\" uses the results directory inside the game data bundle cache."))
+    find_parser.add_argument("--result-cache-size", type=int, default=256,
+            help="The maximum size of the result cache, in MB. The least recently used results are evicted first. Default: 256")
+    find_parser.add_argument("--stats", action="store_true",
+            help="Report the time spent in each phase of the calculation, along with route and search counts.")
+    find_parser.add_argument("--trace", metavar="FILE",
+            help="Append a trace of the calculation to this file, as JSON lines. Print it with: calc-routes trace FILE")
+    find_parser.add_argument("-v", "--verbose", action="store_true")
+
+    server.add_arguments(modes.add_parser("serve", help=server.DESCRIPTION, description=server.DESCRIPTION))
+    bulk.add_arguments(modes.add_parser("bulk", help=bulk.DESCRIPTION, description=bulk.DESCRIPTION))
+    tracing.add_arguments(modes.add_parser("trace", help=tracing.DESCRIPTION, description=tracing.DESCRIPTION))
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0] not in modes.choices and argv[0] not in ("-h", "--help")):
+        argv = [_DEFAULT_MODE] + argv
+
+    args = vars(parser.parse_args(argv))
+    if args["mode"] == _DEFAULT_MODE and args["all"] == bool(args["active-railroads"]):
+        find_parser.error("Provide either one or more railroad names, or --all.")
+    return args
+
+def _print_route_set(best_route_set):
+    for route in best_route_set:
+        stop_path = " -> ".join(f"{stop.name} [{route.stop_values[stop]}]" for stop in route.visited_stops)
+        print(f"{route.train}: {route} = {route.value} ({stop_path})")
 
-def main():
-    args = parse_args()
+def result_to_dict(railroad, best_route_set, elapsed, include_stats=False):
+    """
+    Returns a JSON-serializable record of a railroad's best route set. elapsed is the number of seconds from the start
+    of the request until this result was ready.
+    """
+    record = {"railroad": railroad.name}
+    record.update(best_route_set.to_dict())
+    record["elapsed"] = round(elapsed, 6)
+    if include_stats:
+        record["stats"] = best_route_set.stats.to_dict() if best_route_set.stats else None
+    return record
+
+def _write_records(records, output_format, is_batch):
+    if output_format == "ndjson":
+        for record in records:
+            print(json.dumps(record), flush=True)
+    elif not is_batch:
+        for record in records:
+            print(json.dumps(record, indent=4), flush=True)
+    else:
+        # Write the array by hand, so each railroad's record is written as soon as it's ready.
+        separator = "[\n"
+        for record in records:
+            print(separator + json.dumps(record), end="", flush=True)
+            separator = ",\n"
+        print("]" if separator != "[\n" else "[]", flush=True)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args["mode"] == "serve":
+        from routes18xx import server
+        server.run(args)
+        return
+    if args["mode"] == "bulk":
+        from routes18xx import bulk
+        bulk.run(args)
+        return
+    if args["mode"] == "trace":
+        tracing.run(args)
+        return
+
+    output_format = args["format"]
 
     logger = logging.getLogger("routes18xx")
-    logger.addHandler(logging.StreamHandler(sys.stdout))
+    logger.addHandler(logging.StreamHandler(sys.stdout if output_format == "text" else sys.stderr))
     logger.setLevel(logging.DEBUG if args["verbose"] else logging.INFO)
 
-    best_route_set = find_best_routes_from_files(args["game"], args["active-railroad"],
-            args["board-state-file"], args["railroads-file"], args.get("private_companies_file"))
+    if args["trace"]:
+        TRACER.open(args["trace"])
 
-    print("RESULT")
-    for route in best_route_set:
-        stop_path = " -> ".join(f"{stop.name} [{route.stop_values[stop]}]" for stop in route.visited_stops)
-        print(f"{route.train}: {route} = {route.value} ({stop_path})")
+    start_time = time.perf_counter()
+
+    result_cache = None
+    if args["result_cache"]:
+        from routes18xx.resultcache import ResultCache
+        result_cache = ResultCache(None if args["result_cache"] == "default" else args["result_cache"], args["result_cache_size"] * 1024 * 1024)
+
+    active_railroad_names = None if args["all"] else args["active-railroads"]
+    is_batch = not active_railroad_names or len(active_railroad_names) > 1
+    if not is_batch and not result_cache:
+        game, board, railroads_in_play = load_from_files(args["game"],
+                args["board-state-file"], args["railroads-file"], args.get("private_companies_file"))
+        active_railroad, = _get_active_railroads(railroads_in_play, active_railroad_names)
+        results = [(active_railroad, find_best_routes(game, board, railroads_in_play, active_railroad))]
+    else:
+        results = iter_best_routes_from_files(args["game"], active_railroad_names,
+                args["board-state-file"], args["railroads-file"], args.get("private_companies_file"), result_cache=result_cache)
+
+    if output_format == "text":
+        for railroad, best_route_set in results:
+            print("RESULT" if not is_batch else f"RESULT: {railroad.name}")
+            _print_route_set(best_route_set)
+            if args["stats"] and best_route_set.stats:
+                print("STATS")
+                print(best_route_set.stats)
+    else:
+        records = (result_to_dict(railroad, best_route_set, time.perf_counter() - start_time, args["stats"]) for railroad, best_route_set in results)
+        _write_records(records, output_format, is_batch)
 
 if __name__ == "__main__":
     main()
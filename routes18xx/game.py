@@ -1,15 +1,17 @@
 import importlib
-import json
 import os
 
-from routes18xx import tiles
+from routes18xx import bundle, tiles
+from routes18xx.bundle import _DATA_ROOT_DIR
 from routes18xx.rules import Rules
 
-_DIR_NAME = "data"
-_DATA_ROOT_DIR = os.path.abspath(os.path.normpath(os.path.join(os.path.dirname(__file__), _DIR_NAME)))
-
 _GAME_FILENAME = "game.json"
 
+# Game definitions which have already been loaded in this process, by name.
+_GAME_DEFINITIONS = {}
+# Each game's module of hooks, or None if it has none, by module name.
+_GAME_MODULES = {}
+
 class Game:
     @staticmethod
     def get_global_game_data_file(filename):
@@ -21,8 +23,22 @@ class Game:
 
     @staticmethod
     def load(game_name):
-        with open(Game.get_game_data_file(game_name, _GAME_FILENAME)) as game_file:
-            game_json = json.load(game_file)
+        """
+        Returns a new Game. The game's definition (its phases, rules, tiles,
+        etc) is only loaded once per process, and is shared between each Game
+        instance. Only the captured phase is specific to each instance.
+        """
+        definition = _GAME_DEFINITIONS.get(game_name)
+        if not definition:
+            definition = Game._load_definition(game_name)
+            _GAME_DEFINITIONS[game_name] = definition
+
+        return Game(definition.name, definition.phases, definition.upgrade_phases, definition.rules, definition.tiles, definition._data)
+
+    @staticmethod
+    def _load_definition(game_name):
+        game_bundle = bundle.load(game_name)
+        game_json = game_bundle.get_data(_GAME_FILENAME)
 
         rules = Rules.load(game_json)
 
@@ -30,27 +46,51 @@ class Game:
             game_name,
             game_json["phases"],
             {int(upgrade_level): phase for upgrade_level, phase in game_json["upgrade_phases"].items()},
-            rules)
+            rules,
+            data=game_bundle)
 
         game.tiles = tiles.load_all(game)
 
         return game
 
-    def __init__(self, game_name, phases, upgrade_phases, rules, tiles={}):
+    @staticmethod
+    def clear_cache():
+        _GAME_DEFINITIONS.clear()
+
+    def __init__(self, game_name, phases, upgrade_phases, rules, tiles={}, data=None):
         self.name = game_name
         self.phases = phases
         self.upgrade_phases = upgrade_phases
         self.rules = rules
         self.tiles = tiles
+        self._data = data
 
         self.current_phase = None
 
+    def copy(self):
+        """Returns a Game which shares this one's definition, but captures its phase separately."""
+        game = Game(self.name, self.phases, self.upgrade_phases, self.rules, self.tiles, self._data)
+        game.current_phase = self.current_phase
+        return game
+
     def get_global_data_file(self, filename):
         return Game.get_global_game_data_file(filename)
 
     def get_data_file(self, filename):
         return Game.get_game_data_file(self.name, filename)
 
+    def load_global_data(self, filename):
+        """Returns the parsed contents of a global data file. The result is shared, so it must not be modified."""
+        if not self._data:
+            self._data = bundle.load(self.name)
+        return self._data.get_global_data(filename)
+
+    def load_data(self, filename):
+        """Returns the parsed contents of one of this game's data files. The result is shared, so it must not be modified."""
+        if not self._data:
+            self._data = bundle.load(self.name)
+        return self._data.get_data(filename)
+
     def capture_phase(self, railroads):
         self.current_phase = self.detect_phase(railroads)
         return self.current_phase
@@ -89,6 +129,14 @@ class Game:
     def hook_route_max_value(self, route, railroad):
         return self._hook("hook_route_max_value", route.value, route, railroad)
 
+    def walk_pruner(self, board):
+        """
+        Returns the game's check for steps of a route walk which can only lead to routes filter_invalid_routes() would
+        remove, or None if the game has none. It's called as prune(railroad, first_stop, stop, enter_from, exit_cell,
+        next_stop) for each step from a stop to the next one, and returns True to skip the step.
+        """
+        return self._hook("hook_walk_pruner", None, board)
+
     def get_game_submodule(self, name):
         try:
             return importlib.import_module(f"{self._get_game_module_name()}.{name}")
@@ -99,10 +147,14 @@ class Game:
         return f"routes18xx.games.routes{self.name}"
 
     def _get_game_module(self):
-        try:
-            return importlib.import_module(self._get_game_module_name())
-        except ModuleNotFoundError:
-            return None
+        # Looking up a missing module is slow, and hooks are called for every route, so the result is remembered.
+        module_name = self._get_game_module_name()
+        if module_name not in _GAME_MODULES:
+            try:
+                _GAME_MODULES[module_name] = importlib.import_module(module_name)
+            except ModuleNotFoundError:
+                _GAME_MODULES[module_name] = None
+        return _GAME_MODULES[module_name]
 
     def _hook(self, hook_name, retval, *args):
         game_module = self._get_game_module()
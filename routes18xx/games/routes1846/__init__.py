@@ -56,6 +56,22 @@ def filter_invalid_routes(routes, board, railroad):
 
     return valid_routes
 
+def hook_walk_pruner(board):
+    """
+    Prunes the walks which filter_invalid_routes() would only remove afterwards:
+    - a walk from an eastern terminus which reaches another one, or
+    - a walk from Chicago Connections which leaves Chicago through an impassable exit
+    """
+    chicago_cell = board.cell(CHICAGO_COORD)
+    chicago_connections_cell = board.cell(CHICAGO_CONNECTIONS_COORD)
+
+    def prune(railroad, first_stop, stop, enter_from, exit_cell, next_stop):
+        if isinstance(first_stop, EasternTerminus) and isinstance(next_stop, EasternTerminus):
+            return True
+        return stop.cell == chicago_cell and enter_from == chicago_connections_cell and not stop.passable(exit_cell, railroad)
+
+    return prune
+
 def hook_route_set_values(route_set, railroad):
     raw_values = {route: route.value for route in route_set}
     if railroad.has_private_company("Mail Contract") and route_set:
@@ -0,0 +1,72 @@
+"""
+Parses game states sent as JSON payloads, rather than as files.
+
+A payload is a JSON object with the following keys:
+- game: the name of the game (e.g. "1846").
+- active_railroads (optional): the names of the railroads to find routes for. Omit it for every railroad in play.
+- board_state, railroads, private_companies (optional): the contents of each state file. Each can be given as the
+  text of the CSV file, or as a list of rows. A row is either a list of column values, or an object keyed by the
+  file's column names.
+"""
+import csv
+import io
+
+from routes18xx import boardstate, railroads
+from routes18xx.find_best_routes import load_from_rows
+from routes18xx.game import Game
+
+
+def parse_rows(value, fieldnames):
+    if not value:
+        return []
+
+    if isinstance(value, str):
+        return list(csv.DictReader(io.StringIO(value), fieldnames=fieldnames, delimiter=';', skipinitialspace=True))
+
+    rows = []
+    for row in value:
+        if isinstance(row, dict):
+            row_values = [row.get(fieldname) for fieldname in fieldnames]
+        elif isinstance(row, (list, tuple)):
+            row_values = list(row) + [None] * (len(fieldnames) - len(row))
+        else:
+            raise ValueError(f"Each row must be a list or an object. Got: {row}")
+
+        # Match the CSV reader, which only ever produces strings.
+        rows.append({fieldname: None if column is None else str(column).strip() for fieldname, column in zip(fieldnames, row_values)})
+    return rows
+
+def get_private_companies_fieldnames(game_name):
+    private_companies_module = Game.load(game_name).get_game_submodule("private_companies")
+    return private_companies_module.FIELDNAMES if private_companies_module else ()
+
+def parse(payload):
+    """
+    Returns the game name, the active railroad names (None for every railroad), and the board state, railroads and
+    private companies rows described by the payload.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("The payload must be a JSON object.")
+
+    game_name = payload.get("game")
+    if not game_name or not isinstance(game_name, str):
+        raise ValueError("The payload must name a game.")
+
+    active_railroad_names = payload.get("active_railroads")
+    if isinstance(active_railroad_names, str):
+        active_railroad_names = [active_railroad_names]
+    elif active_railroad_names is not None \
+            and (not isinstance(active_railroad_names, list) or not all(isinstance(name, str) for name in active_railroad_names)):
+        raise ValueError("The active railroads must be a railroad name, or a list of them.")
+
+    board_state_rows = parse_rows(payload.get("board_state"), boardstate.FIELDNAMES)
+    railroads_rows = parse_rows(payload.get("railroads"), railroads.FIELDNAMES)
+    private_companies_rows = parse_rows(payload.get("private_companies"), get_private_companies_fieldnames(game_name))
+
+    return game_name, active_railroad_names, board_state_rows, railroads_rows, private_companies_rows
+
+def load(payload):
+    """Returns the game, board, railroads in play, and active railroad names (None for every railroad) described by the payload."""
+    game_name, active_railroad_names, board_state_rows, railroads_rows, private_companies_rows = parse(payload)
+    game, board, railroads_in_play = load_from_rows(game_name, board_state_rows, railroads_rows, private_companies_rows)
+    return game, board, railroads_in_play, active_railroad_names
@@ -1,4 +1,5 @@
 import collections
+import copy
 import itertools
 
 from routes18xx import boardtile
@@ -33,7 +34,10 @@ class PlacedTile(object):
         properties = old_space.properties if old_space else {}
 
         paths = PlacedTile.get_paths(cell, tile, orientation)
-        return PlacedTile(name, nickname, cell, tile, paths, properties)
+        placed_tile = PlacedTile(name, nickname, cell, tile, paths, properties)
+        if old_space:
+            placed_tile._upgrade_from(old_space)
+        return placed_tile
 
     def __init__(self, name, nickname, cell, tile, paths={}, properties={}):
         self.name = name or str(cell)
@@ -56,6 +60,20 @@ class PlacedTile(object):
         self.home = None
         self.reserved = None
 
+    def _upgrade_from(self, old_space):
+        # The stations and tokens on a space stay there when it's upgraded.
+        self.tokens = list(old_space.tokens)
+        if old_space.is_city:
+            self.home = old_space.home
+            self.reserved = old_space.reserved
+            for station in old_space.stations:
+                self._add_upgraded_station(old_space, station)
+
+    def _add_upgraded_station(self, old_space, station):
+        if len(self._stations) >= self.capacity:
+            raise ValueError(f"{self.name} ({self.cell}) cannot hold all the stations on the tile it replaces.")
+        self._stations.append(station)
+
     def value(self, game, railroad, train):
         return self.tile.value + sum(token.value(game, railroad) for token in self.tokens)
 
@@ -71,6 +89,12 @@ class PlacedTile(object):
     def stations(self):
         return tuple(self._stations)
 
+    def copy(self):
+        space = copy.copy(self)
+        space.tokens = list(self.tokens)
+        space._stations = list(self._stations)
+        return space
+
     def add_station(self, game, railroad):
         if self.has_station(railroad.name):
             raise ValueError(f"{railroad.name} already has a station in {self.name} ({self.cell}).")
@@ -158,7 +182,10 @@ class SplitCity(PlacedTile):
         properties = old_space.properties if old_space else {}
 
         paths = PlacedTile.get_paths(cell, tile, orientation)
-        return SplitCity(name, nickname, cell, tile, orientation, paths, properties)
+        split_city = SplitCity(name, nickname, cell, tile, orientation, paths, properties)
+        if old_space:
+            split_city._upgrade_from(old_space)
+        return split_city
 
     def __init__(self, name, nickname, cell, tile, orientation, paths={}, properties={}):
         super().__init__(name, nickname, cell, tile, paths, properties)
@@ -166,6 +193,11 @@ class SplitCity(PlacedTile):
         self.capacity = SplitCity._map_branches_to_cells(cell, orientation, self.capacity)
         self.branch_to_station = {key: [] for key in self.capacity.keys()}
 
+    def copy(self):
+        space = super().copy()
+        space.branch_to_station = {branch: list(stations) for branch, stations in self.branch_to_station.items()}
+        return space
+
     def add_station(self, game, railroad, branch):
         if self.has_station(railroad.name):
             raise ValueError(f"{railroad.name} already has a station in {self.name} ({self.cell}).")
@@ -186,6 +218,20 @@ class SplitCity(PlacedTile):
         self.branch_to_station[split_branch].append(station)
         return station
 
+    def _add_upgraded_station(self, old_space, station):
+        old_branch = old_space.get_station_branch(station)
+        for branch in self.capacity:
+            if any(path in branch for path in old_branch):
+                break
+        else:
+            raise ValueError(f"No branch of {self.name} ({self.cell}) continues the branch with the {station.railroad.name} station.")
+
+        if self.capacity[branch] <= len(self.branch_to_station[branch]):
+            raise ValueError(f"The branch of {self.name} ({self.cell}) with the {station.railroad.name} station cannot hold all its stations.")
+
+        self._stations.append(station)
+        self.branch_to_station[branch].append(station)
+
     def passable(self, enter_cell, railroad):
         for branch, stations in self.branch_to_station.items():
             for path in branch:
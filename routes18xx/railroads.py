@@ -1,5 +1,4 @@
 import csv
-import json
 
 from routes18xx import trains, train_limits
 from routes18xx.tokens import Station
@@ -22,6 +21,18 @@ class Railroad(object):
         self.trains = railroad_trains
         self._private_companies = []
 
+    def __eq__(self, other):
+        return isinstance(other, Railroad) and self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def copy(self, railroad_trains):
+        """Returns a copy of this railroad running the given trains, with the same private companies."""
+        railroad = Railroad.create(self.name, railroad_trains)
+        railroad._private_companies = list(self._private_companies)
+        return railroad
+
     def add_private_company(self, name):
         self._private_companies.append(name)
 
@@ -67,8 +78,16 @@ def _split_station_entry(station_entry):
     return coord.strip(), branch
 
 def _load_railroad_info(game):
-    with open(game.get_data_file(_RAILROADS_FILENAME)) as railroads_file:
-        return json.load(railroads_file)
+    return game.load_data(_RAILROADS_FILENAME)
+
+def get_railroad_names(game):
+    """Returns a dict of each of the game's railroad names and nicknames => the railroad's name."""
+    railroad_names = {}
+    for name, info in _load_railroad_info(game).items():
+        railroad_names[name] = name
+        for nickname in info.get("nicknames", []):
+            railroad_names[nickname] = name
+    return railroad_names
 
 def load_from_csv(game, board, railroads_filepath):
     with open(railroads_filepath, newline='') as railroads_file:
@@ -126,10 +145,10 @@ def load(game, board, railroads_rows):
     # created.
     for name, info in railroad_info.items():
         # Railroads which are in play.
-        board.get_space(board.cell(info["home"])).home = name
+        board.set_home(info["home"], name)
         if name not in railroads or not isinstance(railroads[name], RemovedRailroad):
             for reserved_coord in info.get("reserved", []):
-                board.get_space(board.cell(reserved_coord)).reserved = name
+                board.set_reserved(reserved_coord, name)
 
         if name in railroads:
             # Allow referring to the railroads in play by their nicknames.
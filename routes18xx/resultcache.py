@@ -0,0 +1,231 @@
+"""
+A persistent, content-addressed cache of best route sets.
+
+Results are keyed by a hash of the game (including its data files), the railroad, the normalized board state,
+railroads and private companies rows, and the library version. Looking up a result only requires reading the state
+files, so a hit never loads the game's board. Once the cache grows past its size limit, the least recently used
+results are evicted.
+
+Entries are pickled, so they can only be read back into the library's own classes (see _EntryUnpickler), and the
+cache directory is only made accessible to its owner.
+"""
+import csv
+import hashlib
+import json
+import os
+import pickle
+import re
+import tempfile
+
+import routes18xx
+from routes18xx import boardstate, bundle, railroads
+from routes18xx.game import Game
+from routes18xx.find_best_routes import LOG, iter_best_routes, load_from_rows
+from routes18xx.payload import get_private_companies_fieldnames
+from routes18xx.stats import RouteStats
+
+# Bump this whenever the key or the layout of an entry changes.
+_CACHE_FORMAT = 1
+_PICKLE_PROTOCOL = 4
+_ENTRY_SUFFIX = ".pickle"
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Eviction removes entries until the cache is this fraction of its limit, so it isn't needed again on the next put.
+_EVICT_TO_FRACTION = 0.75
+# The only globals besides the library's own classes which entries hold.
+_SAFE_GLOBALS = {
+    ("builtins", "dict"),
+    ("builtins", "frozenset"),
+    ("builtins", "list"),
+    ("builtins", "set"),
+    ("builtins", "tuple"),
+    ("collections", "Counter"),
+    ("collections", "OrderedDict"),
+    ("collections", "defaultdict")
+}
+
+
+def get_default_directory():
+    cache_dir = bundle.get_cache_dir()
+    return os.path.join(cache_dir, "results") if cache_dir else None
+
+def _read_rows(filepath, fieldnames):
+    if not filepath:
+        return []
+
+    with open(filepath, newline='') as rows_file:
+        return list(csv.DictReader(rows_file, fieldnames=fieldnames, delimiter=';', skipinitialspace=True))
+
+def _normalize_rows(rows, fieldnames):
+    normalized_rows = []
+    for row in rows:
+        values = tuple(re.sub(r"\s+", " ", str(row.get(fieldname) or "")).strip() for fieldname in fieldnames)
+        if any(values):
+            normalized_rows.append(values)
+    return sorted(normalized_rows)
+
+def _railroad_names_in_play(railroads_rows):
+    names = []
+    for row in railroads_rows:
+        name = (row.get("name") or "").strip()
+        if name and (row.get("trains") or "").strip().lower() not in ("removed", "closed") and name not in names:
+            names.append(name)
+    return names
+
+
+class _EntryUnpickler(pickle.Unpickler):
+    """
+    Only loads the library's classes and plain containers. Anyone who can write to the cache directory could otherwise
+    run arbitrary code through a crafted entry.
+    """
+    def find_class(self, module, name):
+        if (module, name) not in _SAFE_GLOBALS and not (module == "routes18xx" or module.startswith("routes18xx.")):
+            raise pickle.UnpicklingError(f"Result cache entries cannot hold {module}.{name}.")
+
+        obj = super().find_class(module, name)
+        if not isinstance(obj, type):
+            raise pickle.UnpicklingError(f"Result cache entries cannot hold {module}.{name}.")
+        return obj
+
+
+class ResultCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or get_default_directory()
+        if not self.directory:
+            raise ValueError("No result cache directory was provided, and caching is disabled.")
+
+        self.max_bytes = max_bytes
+        # entry filepath => size in bytes, of the entries this cache knows about. It's filled in by the first put, and
+        # refreshed whenever it goes past the limit, since other processes may share the directory.
+        self._entry_sizes = None
+
+    def key(self, game_name, railroad_name, board_state_rows, railroads_rows, private_companies_rows=None):
+        private_companies_fieldnames = get_private_companies_fieldnames(game_name)
+        key_data = {
+            "format": _CACHE_FORMAT,
+            "version": routes18xx.__version__,
+            "game": game_name,
+            # The data files' stamps catch any change to the game's definition.
+            "game_data": sorted((os.path.basename(path), stamp) for path, stamp in bundle.get_source_stamps(game_name).items()),
+            "railroad": railroad_name,
+            "board_state": _normalize_rows(board_state_rows, boardstate.FIELDNAMES),
+            "railroads": _normalize_rows(railroads_rows, railroads.FIELDNAMES),
+            "private_companies": _normalize_rows(private_companies_rows or [], private_companies_fieldnames)
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _get_entry_filepath(self, key):
+        return os.path.join(self.directory, key[:2], key + _ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Returns the cached (railroad, route set) pair, or None if it isn't cached."""
+        entry_filepath = self._get_entry_filepath(key)
+        try:
+            with open(entry_filepath, "rb") as entry_file:
+                entry = _EntryUnpickler(entry_file).load()
+            # Mark the entry as recently used.
+            os.utime(entry_filepath)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError, TypeError):
+            LOG.warning(f"Discarding an unreadable result cache entry: {entry_filepath}")
+            self._remove(entry_filepath)
+            return None
+
+        return entry
+
+    def put(self, key, railroad, route_set):
+        entry_filepath = self._get_entry_filepath(key)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        os.makedirs(os.path.dirname(entry_filepath), mode=0o700, exist_ok=True)
+
+        fd, temp_filepath = tempfile.mkstemp(dir=os.path.dirname(entry_filepath), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as entry_file:
+                pickle.dump((railroad, route_set), entry_file, protocol=_PICKLE_PROTOCOL)
+            entry_size = os.path.getsize(temp_filepath)
+            os.replace(temp_filepath, entry_filepath)
+        except BaseException:
+            self._remove(temp_filepath)
+            raise
+
+        if self._entry_sizes is None:
+            self._entry_sizes = {filepath: size for _, size, filepath in self._scan()}
+        self._entry_sizes[entry_filepath] = entry_size
+        if sum(self._entry_sizes.values()) > self.max_bytes:
+            self._evict()
+
+    def _remove(self, filepath):
+        try:
+            os.unlink(filepath)
+        except OSError:
+            pass
+
+    def _scan(self):
+        """Returns (last used time, size, filepath) for every entry in the cache."""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(_ENTRY_SUFFIX):
+                    filepath = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(filepath)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, filepath))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._scan())
+        self._entry_sizes = {filepath: size for _, size, filepath in entries}
+
+        total_bytes = sum(self._entry_sizes.values())
+        for _, size, filepath in entries:
+            if total_bytes <= self.max_bytes * _EVICT_TO_FRACTION:
+                break
+            self._remove(filepath)
+            del self._entry_sizes[filepath]
+            total_bytes -= size
+
+    def iter_best_routes(self, game_name, active_railroad_names, board_state_rows, railroads_rows, private_companies_rows=None, worker_pool=None):
+        """
+        Like find_best_routes.iter_best_routes(), but takes the state as rows. Cached results are yielded first,
+        without loading the board. The remaining railroads are computed together, then cached.
+        """
+        if active_railroad_names is None:
+            active_railroad_names = _railroad_names_in_play(railroads_rows)
+
+        # A railroad's nicknames share its entry.
+        railroad_names = railroads.get_railroad_names(Game.load(game_name))
+        active_railroad_names = list(dict.fromkeys(railroad_names.get(name, name) for name in active_railroad_names))
+
+        keys = {}
+        missing_names = []
+        for name in active_railroad_names:
+            stats = RouteStats()
+            with stats.phase("cache"):
+                keys[name] = self.key(game_name, name, board_state_rows, railroads_rows, private_companies_rows)
+                entry = self.get(keys[name])
+            if entry:
+                LOG.info(f"Found cached routes for {name}.")
+                railroad, route_set = entry
+                # The stored stats describe the calculation which found the routes, not this request.
+                stats.count("cache_hits")
+                route_set.stats = stats
+                yield railroad, route_set
+            else:
+                missing_names.append(name)
+
+        if missing_names:
+            game, board, railroads_in_play = load_from_rows(game_name, board_state_rows, railroads_rows, private_companies_rows)
+            for railroad, route_set in iter_best_routes(game, board, railroads_in_play, missing_names, worker_pool):
+                for name in missing_names:
+                    if railroads_in_play[name] is railroad:
+                        self.put(keys[name], railroad, route_set)
+                yield railroad, route_set
+
+    def iter_best_routes_from_files(self, game_name, active_railroad_names, board_state_filename, railroads_filename, private_companies_filename=None, worker_pool=None):
+        board_state_rows = _read_rows(board_state_filename, boardstate.FIELDNAMES)
+        railroads_rows = _read_rows(railroads_filename, railroads.FIELDNAMES)
+        private_companies_rows = _read_rows(private_companies_filename, get_private_companies_fieldnames(game_name))
+        yield from self.iter_best_routes(game_name, active_railroad_names, board_state_rows, railroads_rows, private_companies_rows, worker_pool)
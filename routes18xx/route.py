@@ -172,6 +172,8 @@ class RouteSet:
     def __init__(self, routes):
         self.routes = routes
         self.value = sum(route.value for route in self.routes)
+        # The RouteStats from the search which found this route set, if any.
+        self.stats = None
 
     def __iter__(self):
         return iter(self.routes)
@@ -179,6 +181,18 @@ class RouteSet:
     def __bool__(self):
         return bool(self.routes)
 
+    @property
+    def run_routes(self):
+        """The routes in this set, without any route set adjustments applied to their values."""
+        return [route.__dict__["route"] for route in self.routes]
+
+    def to_dict(self):
+        """Returns a JSON-serializable description of this route set."""
+        return {
+            "value": self.value,
+            "routes": [_run_route_to_dict(route) for route in self.routes]
+        }
+
     def __gt__(self, other):
         if isinstance(other, numbers.Integral):
             return self.value > other
@@ -193,6 +207,14 @@ class RouteSet:
             return self.value == other.value
         return NotImplemented
 
+def _run_route_to_dict(run_route):
+    return {
+        "train": str(run_route.train),
+        "value": run_route.value,
+        "cells": [str(tile.cell) for tile in run_route],
+        "stops": [{"name": stop.name, "cell": str(stop.cell), "value": run_route.stop_values[stop]} for stop in run_route.visited_stops]
+    }
+
 class _RouteProxy:
     def __init__(self, route, value):
         self.route = route
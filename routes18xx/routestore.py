@@ -0,0 +1,262 @@
+"""
+A compact store of a railroad's run routes, for the route search.
+
+Late in a game, a railroad can have hundreds of thousands of routes per train. As Python objects, each one holds a
+tuple of tiles, a list of edge sets and a dict of stop values, which adds up to far more memory than the routes need.
+A RouteStore keeps them as flat typed arrays instead, one column per field, with every train's routes stored one after
+another:
+- node offsets and nodes: where each route's tiles start, and each tile's index in the store's tile table,
+- stop offsets, stops and stop values: the route's stops, and what the train collects from each,
+- edge offsets and edge words: the edges the route uses, as a bitmask split into 64 bit words, least significant word
+  first, each stored little-endian whatever the host's byte order,
+- values and max values: the route's value, and its value with any of the game's adjustments (see
+  Game.hook_route_max_value()).
+
+Routes are referred to by their index in the store. The search only needs their values and edges, so run routes are
+only rebuilt when a route set is created, and the most recently used ones are kept (see run_route()).
+
+If $ROUTES18XX_ROUTE_STORE_DIR is set, each store is moved to a memory-mapped temporary file in that directory once
+it's built (see spill()). The operating system can then page the routes out, and worker processes map the same file,
+rather than receiving a copy of the routes.
+"""
+import array
+import collections
+import mmap
+import os
+import sys
+import tempfile
+import weakref
+
+from routes18xx.route import RouteSet, Route, _RunRoute
+
+ROUTE_STORE_DIR_ENV_VAR = "ROUTES18XX_ROUTE_STORE_DIR"
+
+# The number of run routes each store keeps around after rebuilding them.
+_RUN_ROUTE_CACHE_SIZE = 4096
+_WORD_BITS = 64
+
+# column name => array typecode
+_COLUMNS = {
+    "node_offsets": "Q",
+    "nodes": "I",
+    "stop_offsets": "Q",
+    "stops": "I",
+    "stop_values": "q",
+    "edge_offsets": "Q",
+    "edge_words": "Q",
+    "values": "q",
+    "max_values": "q"
+}
+
+
+def _remove_file(filepath):
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+
+
+class RouteStore:
+    @staticmethod
+    def from_run_routes(game, railroad, run_routes_by_train):
+        store = RouteStore()
+        for train, run_routes in run_routes_by_train.items():
+            store.add(game, railroad, train, run_routes)
+        return store
+
+    def __init__(self):
+        self._columns = {name: array.array(typecode) for name, typecode in _COLUMNS.items()}
+        self._columns["node_offsets"].append(0)
+        self._columns["stop_offsets"].append(0)
+        self._columns["edge_offsets"].append(0)
+
+        self._tiles = []
+        self._tile_indices = {}
+        # (lower tile index, higher tile index) => edge number
+        self._edge_numbers = {}
+        # train => (index of its first route, index after its last route)
+        self._train_ranges = {}
+
+        # index => run route, least recently used first
+        self._run_routes = collections.OrderedDict()
+        self._filepath = None
+        self._mapping = None
+        self._finalizer = None
+
+    def add(self, game, railroad, train, run_routes):
+        """Adds the train's run routes, which can be any iterable. A train's routes can only be added once."""
+        if train in self._train_ranges:
+            raise ValueError(f"Routes have already been added for {train}.")
+        if self._mapping:
+            raise ValueError("Routes can't be added once the store has been spilled.")
+
+        columns = self._columns
+        start = len(columns["values"])
+        for run_route in run_routes:
+            tile_indices = [self._tile_indices.get(tile) for tile in run_route]
+            if None in tile_indices:
+                tile_indices = [self._get_tile_index(tile) for tile in run_route]
+            columns["nodes"].extend(tile_indices)
+            columns["node_offsets"].append(len(columns["nodes"]))
+
+            # Stop values hold every stop on the route, in order.
+            for stop, value in run_route.stop_values.items():
+                columns["stops"].append(self._tile_indices[stop])
+                columns["stop_values"].append(value)
+            columns["stop_offsets"].append(len(columns["stops"]))
+
+            edges = 0
+            for from_index, to_index in zip(tile_indices, tile_indices[1:]):
+                edges |= 1 << self._get_edge_number(from_index, to_index)
+            columns["edge_words"].extend(self._to_words(edges))
+            columns["edge_offsets"].append(len(columns["edge_words"]))
+
+            columns["values"].append(run_route.value)
+            columns["max_values"].append(game.hook_route_max_value(run_route, railroad))
+        self._train_ranges[train] = (start, len(columns["values"]))
+
+    def _get_tile_index(self, tile):
+        index = self._tile_indices.get(tile)
+        if index is None:
+            index = self._tile_indices[tile] = len(self._tiles)
+            self._tiles.append(tile)
+        return index
+
+    def _get_edge_number(self, from_index, to_index):
+        edge = (from_index, to_index) if from_index < to_index else (to_index, from_index)
+        number = self._edge_numbers.get(edge)
+        if number is None:
+            number = self._edge_numbers[edge] = len(self._edge_numbers)
+        return number
+
+    @staticmethod
+    def _to_words(edges):
+        words = array.array("Q")
+        while edges:
+            words.append(edges & ((1 << _WORD_BITS) - 1))
+            edges >>= _WORD_BITS
+        # The words' bytes are read back as one little-endian number (see edges()).
+        if sys.byteorder == "big":
+            words.byteswap()
+        return words
+
+    @property
+    def trains(self):
+        return tuple(self._train_ranges)
+
+    @property
+    def nbytes(self):
+        """The size of the store's columns, in bytes."""
+        return sum(len(column) * column.itemsize for column in self._columns.values())
+
+    def __len__(self):
+        return len(self._columns["values"])
+
+    def routes(self, train):
+        """Returns the indices of the train's routes."""
+        return range(*self._train_ranges.get(train, (0, 0)))
+
+    def sorted_routes(self, train):
+        """
+        Returns the indices of the train's routes, from the most to the least valuable. Routes with the same value keep
+        the order they were added in.
+        """
+        return array.array("Q", sorted(self.routes(train), key=self._columns["values"].__getitem__, reverse=True))
+
+    def value(self, index):
+        return self._columns["values"][index]
+
+    def max_value(self, index):
+        return self._columns["max_values"][index]
+
+    def edges(self, index):
+        """Returns the bitmask of the edges the route uses. Two routes overlap if their bitmasks share a bit."""
+        edge_offsets = self._columns["edge_offsets"]
+        return int.from_bytes(self._columns["edge_words"][edge_offsets[index]:edge_offsets[index + 1]], "little")
+
+    def train(self, index):
+        for train, (start, stop) in self._train_ranges.items():
+            if start <= index < stop:
+                return train
+        raise IndexError(f"No route at index {index}.")
+
+    def run_route(self, index):
+        """
+        Rebuilds the route's run route. The most recently rebuilt ones are kept, so they're only rebuilt once, but a
+        route can still be rebuilt as a new object later on, so run routes must not be compared by identity.
+        """
+        run_route = self._run_routes.get(index)
+        if run_route is not None:
+            self._run_routes.move_to_end(index)
+            return run_route
+
+        columns = self._columns
+        node_offsets = columns["node_offsets"]
+        route = Route.create([self._tiles[tile_index] for tile_index in columns["nodes"][node_offsets[index]:node_offsets[index + 1]]])
+
+        stop_start, stop_end = columns["stop_offsets"][index], columns["stop_offsets"][index + 1]
+        stop_values = {self._tiles[tile_index]: value
+                for tile_index, value in zip(columns["stops"][stop_start:stop_end], columns["stop_values"][stop_start:stop_end])}
+
+        run_route = self._run_routes[index] = _RunRoute(route, stop_values, self.train(index))
+        if len(self._run_routes) > _RUN_ROUTE_CACHE_SIZE:
+            self._run_routes.popitem(last=False)
+        return run_route
+
+    def route_set(self, game, railroad, indices):
+        return RouteSet.create(game, railroad, [self.run_route(index) for index in indices])
+
+    def spill(self, directory=None):
+        """
+        Moves the columns to a temporary file in the directory, which is memory-mapped in their place. The file is
+        removed once the store is garbage collected, so copies of it sent to other processes must not outlive it.
+        """
+        if self._mapping:
+            return
+
+        fd, filepath = tempfile.mkstemp(dir=directory, prefix=".routes.", suffix=".tmp")
+        layout = {}
+        with os.fdopen(fd, "wb") as store_file:
+            offset = 0
+            for name, column in self._columns.items():
+                data = column.tobytes()
+                # Each column starts on a word boundary.
+                data += bytes(-len(data) % 8)
+                store_file.write(data)
+                layout[name] = (offset, len(column) * column.itemsize)
+                offset += len(data)
+        self._map(filepath, layout)
+        # The file is only removed by the store which wrote it, not the copies in other processes.
+        self._finalizer = weakref.finalize(self, _remove_file, filepath)
+
+    def _map(self, filepath, layout):
+        # The file is never empty, since the offset columns always start with a 0.
+        with open(filepath, "rb") as store_file:
+            self._mapping = mmap.mmap(store_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._filepath = filepath
+        self._layout = layout
+        self._columns = {name: memoryview(self._mapping)[offset:offset + length].cast(_COLUMNS[name])
+                for name, (offset, length) in layout.items()}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_run_routes"] = collections.OrderedDict()
+        if self._mapping:
+            # Other processes map the same file, rather than receiving a copy of the columns.
+            for name in ("_columns", "_mapping", "_finalizer"):
+                del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "_columns" not in state:
+            self._finalizer = None
+            self._map(self._filepath, self._layout)
+
+
+def spill_if_configured(store):
+    """Spills the store to $ROUTES18XX_ROUTE_STORE_DIR, if it's set."""
+    directory = os.environ.get(ROUTE_STORE_DIR_ENV_VAR)
+    if directory:
+        store.spill(directory)
+    return store
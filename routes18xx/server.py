@@ -0,0 +1,234 @@
+"""
+A long-running route server, which keeps game data, base boards and the worker pool warm between requests.
+
+Requests are made over HTTP, on either a localhost port or a Unix socket:
+- POST /routes with a JSON payload (see routes18xx.payload). The response is a JSON object whose "results" key holds
+  one record per railroad, in the same format as `calc-routes --format json`.
+- GET /health reports the number of queued requests.
+
+Requests are computed by a fixed number of threads, which share one worker pool. Requests waiting for a thread are
+held in a bounded queue. Once the queue is full, new requests are rejected with 503 Service Unavailable. If a client
+disconnects before its response is ready, its request is cancelled.
+"""
+import argparse
+import http.server
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from routes18xx import bundle, payload
+from routes18xx.board import Board
+from routes18xx.cancellation import CancelToken, Cancelled
+from routes18xx.find_best_routes import LOG, WorkerPool, iter_best_routes, result_to_dict
+from routes18xx.game import Game
+
+_DEFAULT_HOST = "127.0.0.1"
+_DEFAULT_PORT = 8018
+_MAX_PAYLOAD_BYTES = 16 * 1024 * 1024
+# How often (in seconds) to check whether a waiting client has disconnected.
+_DISCONNECT_POLL_INTERVAL = 0.5
+
+DESCRIPTION = "Serve route calculations over HTTP, keeping game data and the worker pool warm."
+
+
+class _Job:
+    def __init__(self, request_payload):
+        self.payload = request_payload
+        self.start_time = time.perf_counter()
+        self.done = threading.Event()
+        self.cancel_token = CancelToken()
+        self.status = None
+        self.response = None
+
+    def finish(self, status, response):
+        self.status = status
+        self.response = response
+        self.done.set()
+
+
+class RouteServer:
+    def __init__(self, computation_threads=1, queue_size=16, processes=None, preload_games=None):
+        self.worker_pool = WorkerPool(processes)
+        self.jobs = queue.Queue(maxsize=queue_size)
+
+        for game_name in (bundle.get_game_names() if preload_games is None else preload_games):
+            LOG.info(f"Preloading {game_name}.")
+            Board.load(Game.load(game_name))
+
+        self._threads = [threading.Thread(target=self._process_jobs, daemon=True) for _ in range(computation_threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, request_payload):
+        """Queues the request, and returns its job. Raises queue.Full if the queue is full."""
+        job = _Job(request_payload)
+        self.jobs.put_nowait(job)
+        return job
+
+    def _process_jobs(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                # A request whose client disconnected while it was queued is never started.
+                job.cancel_token.raise_if_cancelled()
+                job.finish(200, self._compute(job))
+            except Cancelled:
+                LOG.info("Cancelled a request, since its client disconnected.")
+                job.finish(None, None)
+            except ValueError as exc:
+                job.finish(400, {"error": str(exc)})
+            except Exception as exc:
+                LOG.exception("Failed to process a request.")
+                job.finish(500, {"error": f"{type(exc).__name__}: {exc}"})
+            finally:
+                self.jobs.task_done()
+
+    def _compute(self, job):
+        game, board, railroads_in_play, active_railroad_names = payload.load(job.payload)
+        results = iter_best_routes(game, board, railroads_in_play, active_railroad_names, self.worker_pool, job.cancel_token)
+        records = [result_to_dict(railroad, best_route_set, time.perf_counter() - job.start_time) for railroad, best_route_set in results]
+        return {"results": records}
+
+    def close(self):
+        self.worker_pool.close()
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "queued": self.server.route_server.jobs.qsize()})
+        else:
+            self._send_json(404, {"error": f"Unrecognized path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/routes":
+            self._send_json(404, {"error": f"Unrecognized path: {self.path}"})
+            return
+
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            content_length = -1
+        if content_length <= 0 or content_length > _MAX_PAYLOAD_BYTES:
+            self._send_json(411 if content_length <= 0 else 413, {"error": "Invalid or missing Content-Length."})
+            return
+
+        try:
+            request_payload = json.loads(self.rfile.read(content_length))
+        except ValueError as exc:
+            self._send_json(400, {"error": f"Could not parse the payload: {exc}"})
+            return
+
+        try:
+            job = self.server.route_server.submit(request_payload)
+        except queue.Full:
+            self._send_json(503, {"error": "Too many requests are queued. Try again later."}, {"Retry-After": "1"})
+            return
+
+        while not job.done.wait(_DISCONNECT_POLL_INTERVAL):
+            if self._is_client_disconnected():
+                job.cancel_token.cancel()
+                self.close_connection = True
+                return
+        self._send_json(job.status, job.response)
+
+    def _is_client_disconnected(self):
+        # A client which closed its end of the connection makes it readable, with nothing left to read.
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        if not readable:
+            return False
+
+        try:
+            return not self.connection.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def _send_json(self, status, body, headers=None):
+        encoded_body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded_body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(encoded_body)
+
+    def address_string(self):
+        # Unix socket clients don't have an address.
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        LOG.debug(f"{self.address_string()} - {format % args}")
+
+
+class _TCPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_http_server(route_server, host=_DEFAULT_HOST, port=_DEFAULT_PORT, unix_socket=None):
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        http_server = _UnixServer(unix_socket, _RequestHandler)
+    else:
+        http_server = _TCPServer((host, port), _RequestHandler)
+
+    http_server.route_server = route_server
+    return http_server
+
+def add_arguments(parser):
+    """Adds this mode's arguments to the parser. The calc-routes command registers them as its serve mode."""
+    parser.add_argument("--host", default=_DEFAULT_HOST,
+            help=f"The address to listen on. Default: {_DEFAULT_HOST}")
+    parser.add_argument("--port", type=int, default=_DEFAULT_PORT,
+            help=f"The port to listen on. Default: {_DEFAULT_PORT}")
+    parser.add_argument("--unix-socket",
+            help="Listen on this Unix socket path, instead of a TCP port.")
+    parser.add_argument("-t", "--threads", type=int, default=1,
+            help="The number of requests to compute concurrently. They all share the worker pool. Default: 1")
+    parser.add_argument("-q", "--queue-size", type=int, default=16,
+            help="The number of requests which can wait for a thread. Requests beyond that are rejected. Default: 16")
+    parser.add_argument("-j", "--processes", type=int,
+            help="The number of processes in the worker pool. Default: the number of CPUs.")
+    parser.add_argument("-v", "--verbose", action="store_true")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="calc-routes serve", description=DESCRIPTION)
+    add_arguments(parser)
+    return vars(parser.parse_args(argv))
+
+def main(argv=None):
+    run(parse_args(argv))
+
+def run(args):
+    logger = logging.getLogger("routes18xx")
+    logger.addHandler(logging.StreamHandler(sys.stderr))
+    logger.setLevel(logging.DEBUG if args["verbose"] else logging.INFO)
+
+    route_server = RouteServer(args["threads"], args["queue_size"], args["processes"])
+    http_server = create_http_server(route_server, args["host"], args["port"], args["unix_socket"])
+    address = args["unix_socket"] or f"{args['host']}:{args['port']}"
+    LOG.info(f"Listening on {address}.")
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        route_server.close()
+        if args["unix_socket"] and os.path.exists(args["unix_socket"]):
+            os.unlink(args["unix_socket"])
+
+if __name__ == "__main__":
+    main()
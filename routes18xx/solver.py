@@ -0,0 +1,399 @@
+"""
+Incrementally recomputes a railroad's best routes as the board changes.
+
+A RouteSolver remembers the routes it walked from each starting cell, along with every cell each walk touched, and
+the value of each route. Applying a tile placement or station placement only discards the walks and route values
+which touched the changed cell. The next search is seeded with the previous best route set, if it's still valid, so
+it can immediately prune anything that can't beat it.
+
+evaluate_tile_placements() and evaluate_station_placements() answer "what if" questions: they solve every legal
+placement on a copy of the solver, so each one only recomputes the routes its cell affects. evaluate_train_purchases()
+does the same for each train the railroad could buy, enumerating and valuing each train's routes only once.
+"""
+import collections
+
+from routes18xx import boardtile, placedtile, train_limits, trains
+from routes18xx.find_best_routes import LOG, SerialWorkerPool, WorkerPool, _find_all_routes, _find_best_routes_by_train
+from routes18xx.railroads import Railroad
+from routes18xx.route import RouteSet
+from routes18xx.stats import RouteStats
+
+
+class TilePlacement:
+    def __init__(self, coord, tile_id, orientation):
+        self.coord = coord
+        self.tile_id = tile_id
+        self.orientation = orientation
+
+    def apply(self, game, board, railroads):
+        tile = game.tiles.get(self.tile_id)
+        if not tile:
+            raise ValueError(f"No tile with the tile ID {self.tile_id} was found.")
+
+        board.place_tile(self.coord, tile, self.orientation)
+        return board.cell(self.coord)
+
+    def affects_all_values(self, railroads, railroad):
+        return False
+
+    def __str__(self):
+        return f"tile {self.tile_id} on {self.coord} in orientation {self.orientation}"
+
+
+class StationPlacement:
+    def __init__(self, coord, railroad_name, branch=None):
+        self.coord = coord
+        self.railroad_name = railroad_name
+        self.branch = branch
+
+    def apply(self, game, board, railroads):
+        if self.railroad_name not in railroads:
+            raise ValueError(f"Unrecognized railroad name: {self.railroad_name}")
+        railroad = railroads[self.railroad_name]
+
+        if isinstance(board.get_space(board.cell(self.coord)), (placedtile.SplitCity, boardtile.SplitCity)):
+            if not self.branch:
+                raise ValueError(f"A split city ({self.coord}) was given as a station for {railroad.name}, but no station branch was specified.")
+
+            board.place_split_station(game, self.coord, railroad, self.branch)
+        else:
+            board.place_station(game, self.coord, railroad)
+        return board.cell(self.coord)
+
+    def affects_all_values(self, railroads, railroad):
+        # Every route's value depends on which of the railroad's stations it runs through.
+        return railroads.get(self.railroad_name) is railroad
+
+    def __str__(self):
+        return f"{self.railroad_name} station on {self.coord}"
+
+
+def get_tile_placements(game, board, coords=None):
+    """
+    Yields every legal TilePlacement on the given coords (every hex which can take a tile, by default), according to
+    Board.place_tile() and Board.validate(). Orientations which lay exactly the same track as an earlier orientation
+    of the same tile are skipped, since they can't change any route.
+    """
+    cells = [board.cell(coord) for coord in coords] if coords is not None else sorted(board.cells)
+    tiles = sorted(game.tiles.values(), key=lambda tile: tile.id)
+    for cell in cells:
+        space = board.get_space(cell)
+        if space and space.upgrade_level is None:
+            continue
+
+        upgrade_level = space.upgrade_level if space else 0
+        for tile in tiles:
+            if tile.upgrade_level <= upgrade_level or tile.upgrade_level not in game.upgrade_phases \
+                    or game.compare_phases(game.upgrade_phases[tile.upgrade_level]) < 0:
+                continue
+
+            seen_paths = set()
+            for orientation in range(6):
+                placement = TilePlacement(str(cell), tile.id, orientation)
+                trial_board = board.copy()
+                try:
+                    placement.apply(game, trial_board, None)
+                    trial_board.validate()
+                except ValueError:
+                    continue
+
+                placed_space = trial_board.get_space(cell)
+                # A split city's orientation also decides which track reaches each of its branches.
+                if not isinstance(placed_space, placedtile.SplitCity):
+                    paths = frozenset((start, end) for start, ends in placed_space._paths.items() for end in ends)
+                    if paths in seen_paths:
+                        continue
+                    seen_paths.add(paths)
+
+                yield placement
+
+def _get_reachable_city_entrances(board, railroad):
+    """
+    Returns a dict of each city the railroad can trace track to from its stations => the cells it can enter the city
+    from. Track can't be traced through a city which is full of other railroads' stations, or through an off-board
+    area.
+    """
+    entrances = collections.defaultdict(set)
+    to_visit = [(None, station.cell) for station in board.stations(railroad.name)]
+    visited = set(to_visit)
+    while to_visit:
+        enter_from, cell = to_visit.pop()
+        space = board.get_space(cell)
+        if enter_from:
+            if space.is_city:
+                entrances[cell].add(enter_from)
+            if space.is_stop and not space.passable(enter_from, railroad):
+                continue
+
+        for neighbor in space.paths(enter_from):
+            neighbor_space = board.get_space(neighbor)
+            if neighbor_space and cell in neighbor_space.paths() and (cell, neighbor) not in visited:
+                visited.add((cell, neighbor))
+                to_visit.append((cell, neighbor))
+    return entrances
+
+def get_station_placements(game, board, railroad):
+    """
+    Yields a StationPlacement for every city the railroad can trace track to from its stations, and where it can
+    place a station (according to the city's add_station(), so capacity, home and reservation rules apply). Split
+    cities yield one placement for each reachable branch with room for a station.
+    """
+    railroads = {railroad.name: railroad}
+    for cell, enter_cells in sorted(_get_reachable_city_entrances(board, railroad).items()):
+        space = board.get_space(cell)
+        if isinstance(space, (placedtile.SplitCity, boardtile.SplitCity)):
+            placements = []
+            for branch in space.capacity:
+                # Any path in the branch identifies it, so use one which the railroad can enter by.
+                branch_paths = [path for path in branch if set(path) & enter_cells]
+                if branch_paths:
+                    placements.append(StationPlacement(str(cell), railroad.name, [str(branch_cell) for branch_cell in branch_paths[0]]))
+        else:
+            placements = [StationPlacement(str(cell), railroad.name)]
+
+        for placement in placements:
+            try:
+                placement.apply(game, board.copy(), railroads)
+            except ValueError:
+                continue
+            yield placement
+
+def get_train_purchases(game, railroad):
+    """
+    Yields each distinct train in the game which the railroad could add to its trains, without breaking the current
+    phase's train limits.
+    """
+    train_limit_info = train_limits.load_train_limits(game)
+    seen_trains = []
+    for train in trains.load_train_info(game):
+        if train in seen_trains:
+            continue
+        seen_trains.append(train)
+
+        try:
+            train_limit_info.validate(game, Railroad.create(railroad.name, railroad.trains + [train]))
+        except ValueError:
+            continue
+        yield train
+
+def _get_path(route):
+    return tuple(tile.cell for tile in route)
+
+def _evaluate_train_purchases_worker(game, railroad, route_value_by_train, purchases):
+    # Each purchase is searched with a copy of the railroad which owns the new train, so the caller's railroad is never
+    # changed.
+    results = []
+    for index, train in purchases:
+        purchase_railroad = railroad.copy(railroad.trains + [train])
+        purchase_route_value_by_train = {railroad_train: route_value_by_train[railroad_train] for railroad_train in purchase_railroad.trains}
+        best_route_set = _find_best_routes_by_train(game, purchase_route_value_by_train, purchase_railroad, SerialWorkerPool())
+        results.append((index, train, best_route_set))
+    return results
+
+def _evaluate_placements_worker(solver, placements):
+    # The solver is already running in a worker, so it searches in this process.
+    solver.worker_pool = SerialWorkerPool()
+    return [(index, placement, solver.copy().apply(placement)) for index, placement in placements]
+
+
+class RouteSolver:
+    def __init__(self, game, board, railroads, active_railroad_name, worker_pool=None):
+        """
+        Solves for the active railroad on a copy of the board, so the caller's board is never modified. The railroads
+        must be the ones the board was loaded with.
+        """
+        if active_railroad_name not in railroads:
+            raise ValueError(f"Unrecognized railroad name: {active_railroad_name}")
+
+        self.game = game
+        self.board = board.copy()
+        self.railroads = railroads
+        self.railroad = railroads[active_railroad_name]
+        self.worker_pool = worker_pool
+
+        if self.railroad.is_removed:
+            raise ValueError(f"Cannot calculate routes for a removed railroad: {self.railroad.name}")
+
+        self.game.capture_phase(railroads)
+
+        # (start cell, stop count, prefixes) => (routes, touched cells, roots routes were left to, stops not stepped to)
+        self._walk_cache = {}
+        # (train, route) => run route
+        self._run_routes = {}
+        self.best_route_set = None
+
+    def copy(self):
+        """
+        Returns a solver which starts from this one's board and caches, but which can be changed independently.
+        Useful for evaluating several alternative changes against the same starting point.
+        """
+        solver = RouteSolver.__new__(RouteSolver)
+        solver.__dict__.update(self.__dict__)
+        solver.board = self.board.copy()
+        solver._walk_cache = self._walk_cache.copy()
+        solver._run_routes = self._run_routes.copy()
+        return solver
+
+    def solve(self):
+        """Returns the best route set for the current board, reusing everything which is still valid."""
+        stats = RouteStats()
+        route_value_by_train = self._find_route_values(stats)
+
+        seed_route_set = self._get_seed_route_set()
+        with stats.phase("search"):
+            self.best_route_set = _find_best_routes_by_train(self.game, route_value_by_train, self.railroad, self.worker_pool, seed_route_set, stats)
+        self.best_route_set.stats = stats
+        return self.best_route_set
+
+    def _find_route_values(self, stats, railroad=None):
+        """
+        Returns the run routes for each of the railroad's trains, reusing the walks and values which are still valid.
+        A copy of the railroad with other trains may be given instead.
+        """
+        railroad = railroad or self.railroad
+        with stats.phase("enumeration"):
+            routes_by_train = _find_all_routes(self.game, self.board, railroad, self._walk_cache, stats)
+
+        LOG.info("Calculating route values.")
+        with stats.phase("valuation"):
+            run_routes = {}
+            route_value_by_train = {}
+            for train, routes in routes_by_train.items():
+                train_run_routes = []
+                for route in routes:
+                    run_route = self._run_routes.get((train, route))
+                    if not run_route:
+                        run_route = route.run(self.game, self.board, train, railroad)
+                        stats.count("routes_run")
+                    run_routes[(train, route)] = run_route
+                    train_run_routes.append(run_route)
+                route_value_by_train[train] = train_run_routes
+            self._run_routes = run_routes
+        return route_value_by_train
+
+    def apply(self, change):
+        """
+        Applies a TilePlacement or StationPlacement, then returns the new best route set. If the change is invalid,
+        a ValueError is raised and the solver is left unchanged.
+        """
+        # Make the change on a copy, so a failed change doesn't leave the board half modified.
+        board = self.board.copy()
+        changed_cell = change.apply(self.game, board, self.railroads)
+        board.validate()
+        self.board = board
+
+        LOG.info(f"Applying {change}.")
+        self._invalidate(changed_cell, change.affects_all_values(self.railroads, self.railroad))
+        return self.solve()
+
+    def evaluate_tile_placements(self, coords=None):
+        """
+        Returns a list of (TilePlacement, best route set) pairs for every legal tile placement on the given coords
+        (see get_tile_placements()), from the highest best route value to the lowest. This solver is left unchanged.
+        """
+        return self._evaluate_placements(lambda: get_tile_placements(self.game, self.board, coords))
+
+    def evaluate_station_placements(self):
+        """
+        Returns a list of (StationPlacement, value gain, best route set) tuples for every station the railroad can
+        place next (see get_station_placements()), from the highest gain to the lowest. The gain is the increase in
+        the best route value over the current board. This solver is left unchanged.
+        """
+        results = self._evaluate_placements(lambda: get_station_placements(self.game, self.board, self.railroad))
+        return [(placement, best_route_set.value - self.best_route_set.value, best_route_set) for placement, best_route_set in results]
+
+    def evaluate_train_purchases(self):
+        """
+        Returns a list of (train, value gain, best route set) tuples for every train the railroad could buy (see
+        get_train_purchases()), from the highest gain to the lowest. The gain is the increase in the best route value
+        over the railroad's current trains.
+
+        Each distinct train's routes are enumerated and valued once, and shared between every purchase which uses
+        it. The searches for each purchase are split between the worker pool's processes.
+        """
+        if not self.worker_pool:
+            with WorkerPool() as worker_pool:
+                self.worker_pool = worker_pool
+                try:
+                    return self.evaluate_train_purchases()
+                finally:
+                    self.worker_pool = None
+
+        if not self.best_route_set:
+            self.solve()
+
+        purchases = list(enumerate(get_train_purchases(self.game, self.railroad)))
+        LOG.info(f"Evaluating {len(purchases)} train purchases.")
+
+        # Find the routes for the railroad's trains and every train it could buy, all at once.
+        all_trains_railroad = self.railroad.copy(self.railroad.trains + [train for _, train in purchases])
+        route_value_by_train = self._find_route_values(RouteStats(), all_trains_railroad)
+
+        chunk_count = min(self.worker_pool.processes, len(purchases))
+        promises = [self.worker_pool.pool.apply_async(_evaluate_train_purchases_worker,
+                (self.game, self.railroad, route_value_by_train, purchases[chunk::chunk_count])) for chunk in range(chunk_count)]
+        results = [result for promise in promises for result in promise.get()]
+
+        # Ties keep the order of the trains in the game data.
+        results.sort(key=lambda result: (-result[2].value, result[0]))
+        return [(train, best_route_set.value - self.best_route_set.value, best_route_set) for _, train, best_route_set in results]
+
+    def _evaluate_placements(self, get_placements):
+        """
+        Solves each placement, and returns (placement, best route set) pairs from the highest value to the lowest.
+
+        The placements are split between the worker pool's processes. Each one is applied to a copy of this solver,
+        so only the walks and route values which touch its cell are recomputed.
+        """
+        if not self.worker_pool:
+            with WorkerPool() as worker_pool:
+                self.worker_pool = worker_pool
+                try:
+                    return self._evaluate_placements(get_placements)
+                finally:
+                    self.worker_pool = None
+
+        # Fill the caches first, so every placement starts from them.
+        if not self.best_route_set:
+            self.solve()
+
+        placements = list(enumerate(get_placements()))
+        LOG.info(f"Evaluating {len(placements)} placements.")
+
+        # The worker pool can't be sent to the workers.
+        base_solver = self.copy()
+        base_solver.worker_pool = None
+
+        chunk_count = min(self.worker_pool.processes, len(placements))
+        promises = [self.worker_pool.pool.apply_async(_evaluate_placements_worker, (base_solver, placements[chunk::chunk_count]))
+                for chunk in range(chunk_count)]
+        results = [result for promise in promises for result in promise.get()]
+
+        # Ties keep the order the placements were enumerated in.
+        results.sort(key=lambda result: (-result[2].value, result[0]))
+        return [(placement, best_route_set) for _, placement, best_route_set in results]
+
+    def _invalidate(self, changed_cell, all_values):
+        self._walk_cache = {key: walk for key, walk in self._walk_cache.items() if changed_cell not in walk[1]}
+
+        if all_values:
+            self._run_routes = {}
+        else:
+            self._run_routes = {key: run_route for key, run_route in self._run_routes.items() if not key[1].contains_cell(changed_cell)}
+
+    def _get_seed_route_set(self):
+        if not self.best_route_set:
+            return None
+
+        # Unchanged routes keep their run routes, so the previous best route set is still valid (with the same value) if
+        # all its routes are still around. They're matched by train and path rather than by object, since the route
+        # set's run routes (and their tiles) are copies when it was found by a worker process.
+        run_routes = {(train, _get_path(route)): run_route for (train, route), run_route in self._run_routes.items()}
+        previous_run_routes = []
+        for run_route in self.best_route_set.run_routes:
+            current_run_route = run_routes.get((run_route.train, _get_path(run_route)))
+            if not current_run_route:
+                return None
+            previous_run_routes.append(current_run_route)
+
+        return RouteSet.create(self.game, self.railroad, previous_run_routes)
@@ -0,0 +1,85 @@
+"""
+Timings and counters collected while finding a railroad's best routes.
+
+The phases are:
+- enumeration: walking the board for every route from the railroad's stations. Includes subroutes and filtering.
+- subroutes: expanding routes into their subroutes.
+- filtering: removing invalid routes.
+- valuation: running each route with each train.
+- search: finding the best route set. Includes adjustment.
+- adjustment: finding route sets which could beat the best one once the game's route set adjustments are applied.
+- worker: the time spent by the workers on the search, summed across all workers.
+- cache: looking the result up in a ResultCache. A result found there only has this phase, and a cache_hits counter.
+"""
+import collections
+import contextlib
+import time
+
+
+class RouteStats:
+    def __init__(self):
+        # phase name => [wall time, CPU time], in seconds
+        self.phases = {}
+        self.counters = collections.Counter()
+        # train => {"enumerated": routes found, "valid": routes left after filtering}
+        self.routes_by_train = {}
+        self.worker_processes = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+        try:
+            yield self
+        finally:
+            self.add_phase_time(name, time.perf_counter() - start_time, time.process_time() - start_cpu_time)
+
+    def add_phase_time(self, name, wall_time, cpu_time):
+        phase_times = self.phases.setdefault(name, [0, 0])
+        phase_times[0] += wall_time
+        phase_times[1] += cpu_time
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def count_routes(self, train, enumerated, valid):
+        self.routes_by_train[train] = {"enumerated": enumerated, "valid": valid}
+        self.count("routes_enumerated", enumerated)
+        self.count("routes_valid", valid)
+
+    def merge(self, other):
+        """Adds another stats object's timings and counters (e.g. a worker's) into this one."""
+        for name, (wall_time, cpu_time) in other.phases.items():
+            self.add_phase_time(name, wall_time, cpu_time)
+        self.counters.update(other.counters)
+        self.routes_by_train.update(other.routes_by_train)
+
+    @property
+    def worker_utilization(self):
+        """The fraction of the worker pool's capacity which was busy during the search, if a search ran."""
+        if "search" not in self.phases or "worker" not in self.phases or not self.worker_processes:
+            return None
+
+        search_time = self.phases["search"][0]
+        return self.phases["worker"][0] / (search_time * self.worker_processes) if search_time else None
+
+    def to_dict(self):
+        worker_utilization = self.worker_utilization
+        return {
+            "phases": {name: {"wall": round(wall_time, 6), "cpu": round(cpu_time, 6)} for name, (wall_time, cpu_time) in self.phases.items()},
+            "counters": dict(sorted(self.counters.items())),
+            "routes_by_train": {str(train): dict(counts) for train, counts in self.routes_by_train.items()},
+            "worker_utilization": round(worker_utilization, 4) if worker_utilization is not None else None
+        }
+
+    def __str__(self):
+        lines = []
+        for name, (wall_time, cpu_time) in self.phases.items():
+            lines.append(f"{name}: {wall_time:.3f}s wall, {cpu_time:.3f}s CPU")
+        for train, counts in self.routes_by_train.items():
+            lines.append(f"{train}: {counts['enumerated']} routes enumerated, {counts['valid']} valid")
+        for name, count in sorted(self.counters.items()):
+            lines.append(f"{name}: {count}")
+        if self.worker_utilization is not None:
+            lines.append(f"worker utilization: {self.worker_utilization:.1%}")
+        return "\n".join(lines)
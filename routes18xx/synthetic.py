@@ -0,0 +1,247 @@
+"""
+Generates random, but valid, game states, for stress testing and benchmarking.
+
+Track is grown outward from the railroads' home cities, one tile at a time, with every placement (or upgrade) checked
+by Board.place_tile(), so the generated board state always loads. The maps themselves come from the game data, so
+the size of the route graph is controlled by the number of railroads in play, the tile density, and the phase (which
+determines the available upgrades and trains).
+"""
+import argparse
+import collections
+import random
+
+from routes18xx import boardstate, boardtile, placedtile, railroads, trains, train_limits
+from routes18xx.board import Board
+from routes18xx.find_best_routes import load_from_rows
+from routes18xx.game import Game
+
+_SEPARATOR = "; "
+
+
+def _get_train_mix(game, phase, railroad_count, trains_per_railroad, rng):
+    """Returns a list of trains for each railroad. Every mix is valid for the phase's train limits."""
+    train_info = trains.load_train_info(game)
+    train_limit_info = train_limits.load_train_limits(game)
+    phase_limit = train_limit_info.limit_dict[phase]
+    available_trains = [train for train in train_info if train in phase_limit.get_trains()]
+    phase_trains = [train for train in available_trains if train.phase == phase]
+    if not phase_trains:
+        raise ValueError(f"{game.name} has no trains which start phase {phase}.")
+
+    game.current_phase = phase
+    train_mix = []
+    for index in range(railroad_count):
+        for _ in range(100):
+            railroad_trains = [rng.choice(available_trains) for _ in range(trains_per_railroad)]
+            # The first railroad holds the train which starts the phase.
+            if index == 0 and not any(train.phase == phase for train in railroad_trains):
+                railroad_trains[0] = rng.choice(phase_trains)
+            try:
+                train_limit_info.validate(game, railroads.Railroad.create("generated", railroad_trains))
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"Could not find a valid mix of {trains_per_railroad} trains in phase {phase}.")
+        train_mix.append(railroad_trains)
+    return train_mix
+
+def _get_tile_candidates(game, board, cell, tile_counts):
+    space = board.get_space(cell)
+    if space and space.upgrade_level is None:
+        return []
+
+    upgrade_level = space.upgrade_level if space else 0
+    is_stop = bool(space and space.is_stop)
+    return [tile for tile in sorted(game.tiles.values(), key=lambda tile: tile.id)
+            if tile.upgrade_level > upgrade_level
+            and tile.is_stop == is_stop
+            and tile.upgrade_level in game.upgrade_phases
+            and game.compare_phases(game.upgrade_phases[tile.upgrade_level]) >= 0
+            and (not tile.quantity or tile_counts[tile] < tile.quantity)]
+
+def _is_connected(board, cell, connected_cells):
+    space = board.get_space(cell)
+    for neighbor in space.paths():
+        neighbor_space = board.get_space(neighbor)
+        if neighbor in connected_cells and neighbor_space and cell in neighbor_space.paths():
+            return True
+    return False
+
+def _try_place_tile(game, board, cell, tile_counts, connected_cells, rng):
+    """Returns the board with a new tile on the cell and the tile's orientation, or None if no tile fits."""
+    candidates = _get_tile_candidates(game, board, cell, tile_counts)
+    rng.shuffle(candidates)
+    for tile in candidates:
+        orientations = list(range(6))
+        rng.shuffle(orientations)
+        for orientation in orientations:
+            trial_board = board.copy()
+            try:
+                trial_board.place_tile(str(cell), tile, orientation)
+            except ValueError:
+                continue
+
+            # New track must extend the network. Upgrades already do, since they preserve the old paths.
+            if cell in connected_cells or _is_connected(trial_board, cell, connected_cells):
+                return trial_board, orientation
+    return None
+
+def _grow_track(game, board, home_cells, density, upgrade_chance, rng):
+    playable_cells = [cell for cell in sorted(board.cells) if not board.get_space(cell) or board.get_space(cell).upgrade_level is not None]
+    target_count = round(density * len(playable_cells))
+
+    connected_cells = set(home_cells)
+    # cell => orientation
+    placed_cells = {}
+    tile_counts = collections.Counter()
+    for _ in range(max(target_count, 1) * 20):
+        if len(placed_cells) >= target_count:
+            break
+
+        if placed_cells and rng.random() < upgrade_chance:
+            cell = rng.choice(sorted(placed_cells))
+        else:
+            frontier = sorted({neighbor for connected_cell in connected_cells for neighbor in connected_cell.neighbors.values()
+                    if neighbor and neighbor not in placed_cells})
+            if not frontier:
+                break
+            cell = rng.choice(frontier)
+
+        old_space = board.get_space(cell)
+        placement = _try_place_tile(game, board, cell, tile_counts, connected_cells, rng)
+        if placement:
+            if isinstance(old_space, placedtile.PlacedTile):
+                tile_counts[old_space.tile] -= 1
+            board, placed_cells[cell] = placement
+            tile_counts[board.get_space(cell).tile] += 1
+            connected_cells.add(cell)
+
+    return board, placed_cells
+
+def _get_reachable_cities(board, start_cell):
+    reachable = set()
+    visited = {start_cell}
+    queue = collections.deque([start_cell])
+    while queue:
+        cell = queue.popleft()
+        space = board.get_space(cell)
+        if space.is_city:
+            reachable.add(cell)
+        for neighbor in space.paths():
+            neighbor_space = board.get_space(neighbor)
+            if neighbor not in visited and neighbor_space and cell in neighbor_space.paths():
+                visited.add(neighbor)
+                queue.append(neighbor)
+    return reachable
+
+def _place_stations(game, board, railroads_in_play, railroad_names, home_coords, station_count, rng):
+    stations_by_railroad = {}
+    for name in railroad_names:
+        railroad = railroads_in_play[name]
+        stations_by_railroad[name] = []
+        candidates = sorted(_get_reachable_cities(board, board.cell(home_coords[name])))
+        rng.shuffle(candidates)
+        for cell in candidates:
+            if len(stations_by_railroad[name]) >= station_count:
+                break
+            if str(cell) == home_coords[name]:
+                continue
+
+            # Split cities need a branch, which isn't worth guessing at.
+            if isinstance(board.get_space(cell), (placedtile.SplitCity, boardtile.SplitCity)):
+                continue
+
+            trial_board = board.copy()
+            try:
+                trial_board.place_station(game, str(cell), railroad)
+            except ValueError:
+                continue
+            board = trial_board
+            stations_by_railroad[name].append(str(cell))
+    return stations_by_railroad
+
+def generate(game_name, density=0.5, stations=2, phase=None, railroad_count=None, trains_per_railroad=2, upgrade_chance=0.3, seed=None):
+    """
+    Returns board state rows and railroads rows (dicts keyed by each file's field names) for a random game state.
+
+    density is the fraction of the map's playable hexes which receive a tile. stations is the number of stations each
+    railroad gets in addition to its home station, if enough cities are reachable. phase defaults to the last one.
+    railroad_count defaults to every railroad in the game. upgrade_chance is the chance that each placement upgrades
+    an existing tile, rather than laying new track.
+    """
+    rng = random.Random(seed)
+    game = Game.load(game_name)
+    phase = str(phase or game.phases[-1])
+    if phase not in game.phases:
+        raise ValueError(f"{game_name} has no phase {phase}. Expected one of: {', '.join(game.phases)}")
+
+    railroad_info = game.load_data(railroads._RAILROADS_FILENAME)
+    railroad_names = sorted(railroad_info)
+    if railroad_count is not None:
+        railroad_names = sorted(rng.sample(railroad_names, min(railroad_count, len(railroad_names))))
+    home_coords = {name: railroad_info[name]["home"] for name in railroad_names}
+
+    train_mix = _get_train_mix(game, phase, len(railroad_names), trains_per_railroad, rng)
+    trains_by_railroad = dict(zip(railroad_names, train_mix))
+
+    board = Board.load(game)
+    board, placed_cells = _grow_track(game, board, [board.cell(coord) for coord in home_coords.values()], density, upgrade_chance, rng)
+
+    board_state_rows = []
+    # Only the final tile on each cell is listed. Loading places the tiles in upgrade level order.
+    for cell, orientation in sorted(placed_cells.items()):
+        board_state_rows.append({"coord": str(cell), "tile_id": board.get_space(cell).tile.id, "orientation": str(orientation)})
+
+    railroads_rows = [{"name": name, "trains": ", ".join(train.name for train in trains_by_railroad[name]), "stations": ""}
+            for name in railroad_names]
+
+    # Load the generated track with just the home stations, then add the rest where they're reachable.
+    game, loaded_board, railroads_in_play = load_from_rows(game_name, board_state_rows, railroads_rows)
+    stations_by_railroad = _place_stations(game, loaded_board, railroads_in_play, railroad_names, home_coords, stations, rng)
+    for row in railroads_rows:
+        row["stations"] = ", ".join(stations_by_railroad[row["name"]])
+
+    # Make sure the final state loads, exactly as a user would load it.
+    load_from_rows(game_name, board_state_rows, railroads_rows)
+    return board_state_rows, railroads_rows
+
+def write_csv(rows, fieldnames, filepath):
+    with open(filepath, "w", newline='') as rows_file:
+        for row in rows:
+            rows_file.write(_SEPARATOR.join(row.get(fieldname) or "" for fieldname in fieldnames).rstrip("; ") + "\n")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a random, valid, board state and railroads file for a game.")
+    parser.add_argument("game",
+            help="The name of the game to generate a state for.")
+    parser.add_argument("board-state-file",
+            help="Where to write the board state CSV.")
+    parser.add_argument("railroads-file",
+            help="Where to write the railroads CSV.")
+    parser.add_argument("-d", "--density", type=float, default=0.5,
+            help="The fraction of the map's playable hexes which get a tile. Default: 0.5")
+    parser.add_argument("-s", "--stations", type=int, default=2,
+            help="The number of stations each railroad gets, in addition to its home station. Default: 2")
+    parser.add_argument("-p", "--phase",
+            help="The phase of the game, which determines the trains and tiles available. Default: the last phase.")
+    parser.add_argument("-r", "--railroads", type=int,
+            help="The number of railroads in play. Default: every railroad.")
+    parser.add_argument("-t", "--trains", type=int, default=2,
+            help="The number of trains each railroad owns. Default: 2")
+    parser.add_argument("-u", "--upgrade-chance", type=float, default=0.3,
+            help="The chance that each placement upgrades an existing tile, rather than laying new track. Default: 0.3")
+    parser.add_argument("--seed", type=int,
+            help="Seed the random number generator, to make the output reproducible.")
+    return vars(parser.parse_args())
+
+def main():
+    args = parse_args()
+
+    board_state_rows, railroads_rows = generate(args["game"], args["density"], args["stations"], args["phase"],
+            args["railroads"], args["trains"], args["upgrade_chance"], args["seed"])
+    write_csv(board_state_rows, boardstate.FIELDNAMES, args["board-state-file"])
+    write_csv(railroads_rows, railroads.FIELDNAMES, args["railroads-file"])
+
+if __name__ == "__main__":
+    main()
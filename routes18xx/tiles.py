@@ -57,9 +57,7 @@ class Tile(object):
 
 
 def load_all(game):
-    with open(game.get_global_data_file(_TILE_DB_FILENAME)) as tiles_file:
-        tiles_db_json = json.load(tiles_file)
-    with open(game.get_data_file(_GAME_TILES_FILENAME)) as tiles_file:
-        game_tiles_json = json.load(tiles_file)
+    tiles_db_json = game.load_global_data(_TILE_DB_FILENAME)
+    game_tiles_json = game.load_data(_GAME_TILES_FILENAME)
 
     return {id: Tile.create(id, quantity=quantity, **tiles_db_json[id]) for id, quantity in game_tiles_json.items()}
\ No newline at end of file
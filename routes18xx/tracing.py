@@ -0,0 +1,119 @@
+"""
+Structured tracing of the route search.
+
+Each trace event has a name, a message template and a set of fields. Events are sent to the routes18xx logger at
+DEBUG level, and are only formatted if the logger actually emits them. If a trace file is open, every event is also
+appended to it as a line of JSON, for offline inspection (see read_trace(), or run calc-routes trace on the file).
+
+Building an event's fields still has a cost, so hot loops should check TRACER.enabled before building them. When
+tracing is disabled, that check is the only work done.
+
+A trace file can be opened with TRACER.open(), or by setting $ROUTES18XX_TRACE_FILE. Process pools started after the
+file is opened pass its path to their workers (see init_worker()), which append to the same file.
+"""
+import json
+import logging
+import os
+import time
+
+TRACE_FILE_ENV_VAR = "ROUTES18XX_TRACE_FILE"
+
+DESCRIPTION = "Print the events in a route search trace file, as one JSON object per line."
+
+
+def _format_value(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return ", ".join(str(item) for item in value)
+    return str(value)
+
+def _to_plain(value):
+    """Converts a field to plain data, so a trace file can be read without loading any game."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        return [_to_plain(item) for item in value]
+    elif isinstance(value, dict):
+        return {str(key): _to_plain(item) for key, item in value.items()}
+    return str(value)
+
+
+class _Event:
+    __slots__ = ("name", "message", "fields")
+
+    def __init__(self, name, message, fields):
+        self.name = name
+        self.message = message
+        self.fields = fields
+
+    def __str__(self):
+        return self.message.format(**{name: _format_value(value) for name, value in self.fields.items()})
+
+
+class Tracer:
+    def __init__(self, logger):
+        self.logger = logger
+        self.filepath = None
+        self._fd = None
+
+        if os.environ.get(TRACE_FILE_ENV_VAR):
+            self.open(os.environ[TRACE_FILE_ENV_VAR])
+
+    @property
+    def enabled(self):
+        return self._fd is not None or self.logger.isEnabledFor(logging.DEBUG)
+
+    def event(self, name, message, **fields):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(_Event(name, message, fields))
+
+        if self._fd is not None:
+            # Each record is a [timestamp, pid, name, fields] array on its own line.
+            data = json.dumps([time.time(), os.getpid(), name, _to_plain(fields)], separators=(",", ":")) + "\n"
+            # A single appending write per record keeps records from different processes from interleaving.
+            os.write(self._fd, data.encode())
+
+    def open(self, filepath):
+        self.close()
+        self._fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.filepath = filepath
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self.filepath = None
+
+
+TRACER = Tracer(logging.getLogger("routes18xx"))
+
+
+def init_worker(filepath):
+    """
+    A process pool initializer, which traces to the file the pool's creator traced to (its TRACER.filepath). Workers
+    which don't inherit the creator's memory (e.g. spawned ones) wouldn't know about the file otherwise.
+    """
+    if filepath:
+        TRACER.open(filepath)
+    else:
+        TRACER.close()
+
+
+def read_trace(filepath):
+    """Yields each event in a trace file, as a dict with time, pid, name and fields keys."""
+    with open(filepath) as trace_file:
+        for line in trace_file:
+            if line.strip():
+                timestamp, pid, name, fields = json.loads(line)
+                yield {"time": timestamp, "pid": pid, "name": name, "fields": fields}
+
+def add_arguments(parser):
+    """Adds the trace mode's arguments to the parser. The calc-routes command registers them as its trace mode."""
+    parser.add_argument("trace-file",
+            help="The trace file to read.")
+    parser.add_argument("-n", "--name", action="append",
+            help="Only print events with this name. Can be given more than once.")
+
+def run(args):
+    for event in read_trace(args["trace-file"]):
+        if not args["name"] or event["name"] in args["name"]:
+            print(json.dumps(event))
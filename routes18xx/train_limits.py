@@ -1,5 +1,4 @@
 import itertools
-import json
 
 from routes18xx.trains import _TRAINS_FILENAME, Train, convert, load_train_info
 
@@ -59,7 +58,6 @@ class TrainLimit:
                 limit.validate(game, railroad)
 
 def load_train_limits(game):
-    with open(game.get_data_file(_TRAINS_FILENAME)) as trains_file:
-        trains_json = json.load(trains_file)
+    trains_json = game.load_data(_TRAINS_FILENAME)
 
     return TrainLimitMaster.load(trains_json["train_limits"], load_train_info(game))
\ No newline at end of file
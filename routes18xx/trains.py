@@ -1,4 +1,3 @@
-import json
 import math
 
 _TRAINS_FILENAME = "trains.json"
@@ -68,7 +67,6 @@ def convert(train_info, trains_str):
     return railroad_trains
 
 def load_train_info(game):
-    with open(game.get_data_file(_TRAINS_FILENAME)) as trains_file:
-        trains_json = json.load(trains_file)
+    trains_json = game.load_data(_TRAINS_FILENAME)
 
     return [Train.create(info.get("name"), info["collect"], info.get("visit"), info["phase"]) for info in trains_json["trains"]]
\ No newline at end of file
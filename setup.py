@@ -1,11 +1,16 @@
+import re
+
 from setuptools import find_packages, setup
 
 with open("README.rst", "r") as readme_file:
     long_description = readme_file.read()
 
+with open("routes18xx/__init__.py", "r") as init_file:
+    version = re.search(r'^__version__ = "(.+)"$', init_file.read(), re.MULTILINE).group(1)
+
 setup(
     name='routes-18xx',
-    version='0.9.2',
+    version=version,
     author="Austin Noto-Moniz",
     author_email="mathfreak65@gmail.com",
     description="Library for caluclating routes in 18xx train games.",
@@ -20,10 +25,11 @@ setup(
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License"
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
     entry_points={
         "console_scripts": [
-            "calc-routes = routes18xx.find_best_routes:main"
+            "calc-routes = routes18xx.find_best_routes:main",
+            "compile-routes-bundles = routes18xx.bundle:main"
         ]
     }
 )
@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+"""
+Benchmarks the regression suite, and compares the results to a baseline. Run it from the repository root as:
+
+    PYTHONHASHSEED=0 PYTHONPATH=. python3 test/run-benchmarks.py test/route-regressions.json
+
+Ties between equally valued routes are broken by set iteration order, which changes the search's node counts, so the
+hash seed must be fixed for the counters to be comparable. The search's counters also depend on the number of worker
+processes, which is why it defaults to 2 rather than the number of CPUs.
+
+The committed baseline (test/benchmark-baseline.json) only holds what doesn't depend on the machine: each case's value,
+counters and route counts. Write it with --write-baseline whenever a change affects them. To also compare wall times
+and peak RSS, write a local baseline with -o on the same machine, and pass it with -b.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+from routes18xx.find_best_routes import WorkerPool, find_best_routes, load_from_files
+from routes18xx.stats import RouteStats
+
+TEST_DIR = os.path.dirname(__file__)
+TEST_DATA_ROOT_DIR = os.path.join(TEST_DIR, "data")
+DEFAULT_BASELINE_FILENAME = os.path.join(TEST_DIR, "benchmark-baseline.json")
+DEFAULT_PROCESSES = 2
+# The results which are the same on any machine, given the same hash seed and number of processes.
+_BASELINE_KEYS = ("value", "counters", "routes_by_train")
+
+def _load_test_suite(suite_filepath):
+    with open(suite_filepath) as suite_file:
+        return json.load(suite_file)["tests"]
+
+def _get_cases(suite_filename):
+    cases = []
+    for game, game_test_data in _load_test_suite(suite_filename).items():
+        for test_data in game_test_data:
+            private_companies_filename = test_data.get("private-companies")
+            for active_name in test_data["active"]:
+                cases.append({
+                    "id": f"{game} - {test_data['name']} - {active_name}",
+                    "game": game,
+                    "railroad": active_name,
+                    "board-state": os.path.join(TEST_DATA_ROOT_DIR, game, test_data["board-state"]),
+                    "railroads": os.path.join(TEST_DATA_ROOT_DIR, game, test_data["railroads"]),
+                    "private-companies": os.path.join(TEST_DATA_ROOT_DIR, game, private_companies_filename) if private_companies_filename else None
+                })
+    return cases
+
+def _get_peak_rss_kb():
+    # ru_maxrss is in kilobytes on Linux. Children only count once they've exited, which pool workers have by now.
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+def _run_case(case, processes, connection):
+    try:
+        start_time = time.perf_counter()
+        game, board, railroads = load_from_files(case["game"], case["board-state"], case["railroads"], case["private-companies"])
+        load_time = time.perf_counter() - start_time
+
+        stats = RouteStats()
+        with WorkerPool(processes) as worker_pool:
+            best_route_set = find_best_routes(game, board, railroads, railroads[case["railroad"]], worker_pool, stats)
+        wall_time = time.perf_counter() - start_time
+
+        result = {"value": best_route_set.value, "wall": wall_time, "load": load_time}
+        result.update(stats.to_dict())
+        result["peak_rss_kb"] = _get_peak_rss_kb()
+        connection.send(result)
+    except Exception as exc:
+        connection.send({"error": f"{type(exc).__name__}: {exc}"})
+
+def _run_case_isolated(case, processes):
+    # Each case gets a fresh process, so its peak RSS isn't inflated by earlier cases.
+    parent_connection, child_connection = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_run_case, args=(case, processes, child_connection))
+    process.start()
+    result = parent_connection.recv()
+    process.join()
+    return result
+
+def _run_benchmarks(suite_filename, repeat, processes):
+    results = {}
+    for case in _get_cases(suite_filename):
+        print(case["id"])
+        runs = [_run_case_isolated(case, processes) for _ in range(repeat)]
+        errors = [run["error"] for run in runs if "error" in run]
+        if errors:
+            print(f"ERROR - {errors[0]}")
+            results[case["id"]] = {"error": errors[0]}
+        else:
+            # The fastest run is the least noisy estimate of the cost of the case.
+            result = min(runs, key=lambda run: run["wall"])
+            result["peak_rss_kb"] = max(run["peak_rss_kb"] for run in runs)
+            results[case["id"]] = result
+            print(f"{result['value']} in {result['wall']:.3f}s, peak RSS {result['peak_rss_kb']} KB, "
+                  f"{result['counters'].get('walk_nodes', 0)} walk nodes, {result['counters'].get('search_nodes', 0)} search nodes")
+        print("")
+    return results
+
+def _get_baseline(results):
+    # Cases which failed have nothing to compare to, and their errors can hold paths on this machine.
+    return {case_id: {key: result[key] for key in _BASELINE_KEYS} for case_id, result in results.items() if "error" not in result}
+
+def _compare(results, baseline, thresholds):
+    """Returns a list of human-readable regressions, comparing each case's results to the baseline."""
+    regressions = []
+    for case_id, result in results.items():
+        baseline_result = baseline.get(case_id)
+        if not baseline_result or "error" in baseline_result:
+            continue
+        if "error" in result:
+            regressions.append(f"{case_id}: {result['error']}")
+            continue
+
+        if result["value"] != baseline_result["value"]:
+            regressions.append(f"{case_id}: value changed from {baseline_result['value']} to {result['value']}")
+
+        # Only local baselines (see -o) hold timings and memory use.
+        measurements = [(name, result[name], baseline_result[name], thresholds[threshold_name])
+                for name, threshold_name in (("wall", "wall"), ("peak_rss_kb", "rss")) if name in baseline_result]
+        # Counters which the baseline doesn't have are new, so there's nothing to compare them to.
+        for name in sorted(baseline_result["counters"]):
+            measurements.append((name, result["counters"].get(name, 0), baseline_result["counters"].get(name, 0), thresholds["counters"]))
+
+        for name, actual, expected, threshold in measurements:
+            # Very short cases are dominated by noise, so small absolute changes in wall time are ignored.
+            if name == "wall" and actual - expected < thresholds["min_wall_delta"]:
+                continue
+            if actual > expected * threshold:
+                regressions.append(f"{case_id}: {name} regressed from {expected} to {actual} (more than {threshold:.2f}x)")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("suite_filename")
+    parser.add_argument("-o", "--output",
+            help="Write the results to this JSON file.")
+    parser.add_argument("-b", "--baseline", default=DEFAULT_BASELINE_FILENAME,
+            help=f"The baseline to compare the results to. Default: {DEFAULT_BASELINE_FILENAME}")
+    parser.add_argument("--write-baseline", action="store_true",
+            help="Replace the baseline with these results, rather than comparing them to it.")
+    parser.add_argument("-r", "--repeat", type=int, default=1,
+            help="Run each case this many times, keeping the fastest. Default: 1")
+    parser.add_argument("-j", "--processes", type=int, default=DEFAULT_PROCESSES,
+            help=f"The number of processes in the worker pool. The committed baseline's counters are only comparable with the default. Default: {DEFAULT_PROCESSES}")
+    parser.add_argument("--wall-threshold", type=float, default=1.5,
+            help="Fail if a case's wall time grows by more than this factor. Default: 1.5")
+    parser.add_argument("--min-wall-delta", type=float, default=0.1,
+            help="Ignore wall time changes smaller than this many seconds. Default: 0.1")
+    parser.add_argument("--rss-threshold", type=float, default=1.25,
+            help="Fail if a case's peak RSS grows by more than this factor. Default: 1.25")
+    parser.add_argument("--counter-threshold", type=float, default=1.1,
+            help="Fail if any of a case's route or node counts grow by more than this factor. Default: 1.1")
+
+    return vars(parser.parse_args())
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if os.environ.get("PYTHONHASHSEED") in (None, "random"):
+        print("WARNING - PYTHONHASHSEED isn't set, so the counters aren't comparable to other runs. Run with PYTHONHASHSEED=0.")
+
+    results = _run_benchmarks(args["suite_filename"], args["repeat"], args["processes"])
+
+    if args["output"]:
+        with open(args["output"], "w") as output_file:
+            json.dump(results, output_file, indent=4, sort_keys=True)
+
+    if args["write_baseline"]:
+        with open(args["baseline"], "w") as baseline_file:
+            json.dump(_get_baseline(results), baseline_file, indent=4, sort_keys=True)
+        sys.exit(0)
+
+    if not os.path.exists(args["baseline"]):
+        print(f"No baseline found at {args['baseline']}.")
+        sys.exit(0)
+
+    with open(args["baseline"]) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    thresholds = {"wall": args["wall_threshold"], "min_wall_delta": args["min_wall_delta"], "rss": args["rss_threshold"], "counters": args["counter_threshold"]}
+    regressions = _compare(results, baseline, thresholds)
+    for regression in regressions:
+        print(f"REGRESSION - {regression}")
+    print("PASS" if not regressions else f"FAILED - {len(regressions)} regression(s)")
+
+    sys.exit(0 if not regressions else 1)
@@ -0,0 +1,61 @@
+import asyncio
+import importlib
+import os
+import unittest
+from unittest import mock
+
+from routes18xx.aio import AsyncRouteFinder, find_best_routes_batch_async
+from routes18xx.find_best_routes import SerialWorkerPool, find_best_routes, iter_best_routes, load_from_files
+
+# The package exports the find_best_routes function under the module's name.
+find_best_routes_module = importlib.import_module("routes18xx.find_best_routes")
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+
+def _load(name):
+    return load_from_files("1846", os.path.join(TEST_DATA_ROOT_DIR, f"board-state-{name}.csv"), os.path.join(TEST_DATA_ROOT_DIR, f"railroads-{name}.csv"))
+
+
+class AsyncRouteFinderTest(unittest.TestCase):
+    def test_concurrent_states_of_one_game(self):
+        game, mid_game_board, mid_game_railroads = _load("mid-game")
+        _, final_board, final_railroads = _load("final")
+        game.current_phase = None
+        # The states are in different phases, but share one game.
+        expected_values = [find_best_routes(game, board, railroads, railroads["Grand Trunk"]).value
+                for board, railroads in ((mid_game_board, mid_game_railroads), (final_board, final_railroads))]
+        game.current_phase = None
+
+        # The finder is created outside of the event loop it's used on.
+        finder = AsyncRouteFinder(max_concurrency=2, processes=2)
+
+        async def find_best_routes_concurrently():
+            async with finder:
+                return await asyncio.gather(
+                        finder.find_best_routes(game, mid_game_board, mid_game_railroads, mid_game_railroads["Grand Trunk"]),
+                        finder.find_best_routes(game, final_board, final_railroads, final_railroads["Grand Trunk"]))
+
+        route_sets = asyncio.run(find_best_routes_concurrently())
+        self.assertEqual([route_set.value for route_set in route_sets], expected_values)
+        self.assertIsNone(game.current_phase)
+
+    def test_batch_shares_walks(self):
+        game, board, railroads = _load("final")
+        names = ["Pennsylvania", "Grand Trunk", "Baltimore & Ohio"]
+        with SerialWorkerPool() as worker_pool:
+            expected_values = {railroad.name: route_set.value for railroad, route_set in iter_best_routes(game, board, railroads, names, worker_pool)}
+
+            shared_walks_class = find_best_routes_module._SharedWalks
+            with mock.patch.object(shared_walks_class, "__init__", autospec=True, side_effect=shared_walks_class.__init__) as shared_walks:
+                finder = AsyncRouteFinder(worker_pool=worker_pool)
+                route_sets = asyncio.run(find_best_routes_batch_async(game, board, railroads, names, finder))
+                finder.close()
+
+        # The board is walked once for every railroad, and the railroads keep the requested order.
+        self.assertEqual(shared_walks.call_count, 1)
+        self.assertEqual(list(route_sets), names)
+        self.assertEqual({name: route_set.value for name, route_set in route_sets.items()}, expected_values)
+
+
+if __name__ == "__main__":
+    unittest.main()
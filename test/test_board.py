@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+import unittest
+
+from routes18xx.board import Board
+from routes18xx.find_best_routes import load_from_files
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+BOARD_STATE_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "board-state-final.csv")
+RAILROADS_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "railroads-final.csv")
+
+
+class BoardTest(unittest.TestCase):
+    def setUp(self):
+        Board.clear_cache()
+        self.switch_interval = sys.getswitchinterval()
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+        Board.clear_cache()
+
+    def _get_reachable_cells(self, board, railroads):
+        return {name: board.reachable_cells(railroad, 4) for name, railroad in railroads.items() if not railroad.is_removed}
+
+    def test_copies_used_from_threads(self):
+        game, board, railroads = load_from_files("1846", BOARD_STATE_FILENAME, RAILROADS_FILENAME)
+        expected = self._get_reachable_cells(board, railroads)
+
+        # Switching threads as often as possible makes them likelier to reach the same edges at the same time.
+        sys.setswitchinterval(1e-6)
+        for _ in range(20):
+            # The boards are copies of a fresh base board, so they start out sharing what it has worked out.
+            Board.clear_cache()
+            boards = [load_from_files("1846", BOARD_STATE_FILENAME, RAILROADS_FILENAME)[1] for _ in range(4)]
+            barrier = threading.Barrier(len(boards))
+            results = [None] * len(boards)
+
+            def run(index):
+                barrier.wait()
+                results[index] = self._get_reachable_cells(boards[index], railroads)
+
+            threads = [threading.Thread(target=run, args=(index, )) for index in range(len(boards))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(results, [expected] * len(boards))
+            edge_bits = list(boards[0]._edge_bits.values())
+            self.assertEqual(len(set(edge_bits)), len(edge_bits))
+
+
+if __name__ == "__main__":
+    unittest.main()
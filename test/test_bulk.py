@@ -0,0 +1,45 @@
+import json
+import os
+import unittest
+
+from routes18xx.bulk import iter_results
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+
+def _read(filename):
+    with open(os.path.join(TEST_DATA_ROOT_DIR, filename)) as data_file:
+        return data_file.read()
+
+def _snapshot(snapshot_id, active_railroads):
+    return json.dumps({
+        "id": snapshot_id,
+        "game": "1846",
+        "active_railroads": active_railroads,
+        "board_state": _read("board-state-mail-contract-best.csv"),
+        "railroads": _read("railroads-mail-contract-best.csv"),
+        "private_companies": _read("companies-mail-contract-best.csv")
+    })
+
+
+class BulkTest(unittest.TestCase):
+    def test_results_in_input_order(self):
+        lines = [
+            _snapshot("grand-trunk", ["Grand Trunk"]),
+            "",
+            "not json",
+            _snapshot("unknown", ["Nope"]),
+            _snapshot("batch", ["Grand Trunk", "Illinois Central"])
+        ]
+        outputs = list(iter_results(lines, processes=2, max_in_flight=2))
+
+        self.assertEqual([(output.get("id"), output["line"]) for output in outputs],
+                [("grand-trunk", 1), (None, 3), ("unknown", 4), ("batch", 5)])
+        self.assertEqual([(record["railroad"], record["value"]) for record in outputs[0]["results"]], [("Grand Trunk", 120)])
+        self.assertIn("error", outputs[1])
+        self.assertEqual(outputs[2]["error"], "Unrecognized railroad name: Nope")
+        self.assertEqual(sorted((record["railroad"], record["value"]) for record in outputs[3]["results"]),
+                [("Grand Trunk", 120), ("Illinois Central", 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
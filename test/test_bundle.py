@@ -0,0 +1,42 @@
+import os
+import pickle
+import stat
+import tempfile
+import unittest
+
+from routes18xx import bundle
+
+
+class _Payload:
+    def __reduce__(self):
+        return (os.system, ("exit 1", ))
+
+
+class BundleTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "bundles")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        compiled_bundle = bundle.compile_bundle("1846")
+        bundle.write_bundle(compiled_bundle, self.cache_dir)
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache_dir).st_mode) & 0o077, 0)
+
+        read_bundle = bundle._read_bundle(bundle._get_bundle_filepath(self.cache_dir, "1846"))
+        self.assertEqual(read_bundle.data, compiled_bundle.data)
+        self.assertEqual(read_bundle.global_data, compiled_bundle.global_data)
+        self.assertFalse(read_bundle.is_stale())
+
+    def test_pickled_bundle_is_ignored(self):
+        os.makedirs(self.cache_dir)
+        with open(bundle._get_bundle_filepath(self.cache_dir, "1846"), "wb") as bundle_file:
+            pickle.dump(_Payload(), bundle_file)
+
+        self.assertIsNone(bundle._read_bundle(bundle._get_bundle_filepath(self.cache_dir, "1846")))
+
+
+if __name__ == "__main__":
+    unittest.main()
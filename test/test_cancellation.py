@@ -0,0 +1,39 @@
+import os
+import unittest
+
+from routes18xx.cancellation import CancelCheck, Cancelled, CancelToken
+from routes18xx.find_best_routes import _SharedWalks, _find_all_routes, load_from_files
+from routes18xx.stats import RouteStats
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+
+
+class CancellationTest(unittest.TestCase):
+    def setUp(self):
+        self.game, self.board, self.railroads = load_from_files("1846", os.path.join(TEST_DATA_ROOT_DIR, "board-state-final.csv"),
+                os.path.join(TEST_DATA_ROOT_DIR, "railroads-final.csv"))
+        self.railroad = self.railroads["Baltimore & Ohio"]
+        self.cancel_token = CancelToken()
+        self.cancel_token.cancel()
+
+    def test_walk_stops_when_cancelled(self):
+        stats = RouteStats()
+        with self.assertRaises(Cancelled):
+            _find_all_routes(self.game, self.board, self.railroad, stats=stats, cancel_token=self.cancel_token)
+        # The first walk notices as soon as it checks the token.
+        self.assertEqual(stats.counters["walk_nodes"], CancelCheck(self.cancel_token).interval)
+
+    def test_shared_walk_stops_when_cancelled(self):
+        stats = RouteStats()
+        shared_walks = _SharedWalks(self.game, self.board, [self.railroad])
+        with self.assertRaises(Cancelled):
+            _find_all_routes(self.game, self.board, self.railroad, shared_walks, stats, cancel_token=self.cancel_token)
+        self.assertEqual(stats.counters["walk_nodes"], CancelCheck(self.cancel_token).interval)
+
+        # Nothing is cached from the cancelled walk, so it's redone in full afterwards.
+        self.assertEqual(_find_all_routes(self.game, self.board, self.railroad, shared_walks),
+                _find_all_routes(self.game, self.board, self.railroad))
+
+
+if __name__ == "__main__":
+    unittest.main()
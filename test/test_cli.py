@@ -0,0 +1,50 @@
+import contextlib
+import io
+import logging
+import os
+import unittest
+
+from routes18xx.find_best_routes import find_best_routes_from_files, main, parse_args
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+BOARD_STATE_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "board-state-mid-game.csv")
+RAILROADS_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "railroads-mid-game.csv")
+
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        # main() sets up logging for the command line, which mustn't outlive the test.
+        self.logger = logging.getLogger("routes18xx")
+        self.handlers = list(self.logger.handlers)
+        self.level = self.logger.level
+
+    def tearDown(self):
+        self.logger.handlers = self.handlers
+        self.logger.setLevel(self.level)
+
+    def test_find_is_the_default_mode(self):
+        for argv in (["1846", "Grand Trunk", BOARD_STATE_FILENAME, RAILROADS_FILENAME],
+                ["find", "1846", "Grand Trunk", BOARD_STATE_FILENAME, RAILROADS_FILENAME]):
+            with self.subTest(argv=argv):
+                args = parse_args(argv)
+                self.assertEqual(args["mode"], "find")
+                self.assertEqual(args["active-railroads"], ["Grand Trunk"])
+
+    def test_modes(self):
+        self.assertEqual(parse_args(["serve", "--port", "9000"])["port"], 9000)
+        self.assertEqual(parse_args(["bulk", "-"])["input"], "-")
+
+        with contextlib.redirect_stdout(io.StringIO()) as stdout, self.assertRaises(SystemExit):
+            parse_args(["--help"])
+        for mode in ("find", "serve", "bulk"):
+            self.assertIn(mode, stdout.getvalue())
+
+    def test_unknown_railroad(self):
+        with self.assertRaisesRegex(ValueError, "Unrecognized railroad name: Nope"):
+            main(["1846", "Nope", BOARD_STATE_FILENAME, RAILROADS_FILENAME])
+        with self.assertRaisesRegex(ValueError, "Unrecognized railroad name: Nope"):
+            find_best_routes_from_files("1846", "Nope", BOARD_STATE_FILENAME, RAILROADS_FILENAME)
+
+
+if __name__ == "__main__":
+    unittest.main()
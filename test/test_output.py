@@ -0,0 +1,62 @@
+import contextlib
+import io
+import json
+import logging
+import os
+import unittest
+
+from routes18xx.find_best_routes import find_best_routes, load_from_files, main
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+BOARD_STATE_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "board-state-mid-game.csv")
+RAILROADS_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "railroads-mid-game.csv")
+
+
+class OutputTest(unittest.TestCase):
+    def setUp(self):
+        # main() sets up logging for the command line, which mustn't outlive the test.
+        self.logger = logging.getLogger("routes18xx")
+        self.handlers = list(self.logger.handlers)
+        self.level = self.logger.level
+
+    def tearDown(self):
+        self.logger.handlers = self.handlers
+        self.logger.setLevel(self.level)
+
+    def _main(self, railroad_names, *options):
+        with contextlib.redirect_stdout(io.StringIO()) as stdout, contextlib.redirect_stderr(io.StringIO()):
+            main([*options, "1846", *railroad_names, BOARD_STATE_FILENAME, RAILROADS_FILENAME])
+        return stdout.getvalue()
+
+    def _get_expected_record(self, railroad_name):
+        game, board, railroads = load_from_files("1846", BOARD_STATE_FILENAME, RAILROADS_FILENAME)
+        best_route_set = find_best_routes(game, board, railroads, railroads[railroad_name])
+        return {"railroad": railroad_name, "value": best_route_set.value}
+
+    def test_json(self):
+        record = json.loads(self._main(["Grand Trunk"], "-f", "json"))
+        self.assertEqual({"railroad": record["railroad"], "value": record["value"]}, self._get_expected_record("Grand Trunk"))
+        self.assertGreaterEqual(record["elapsed"], 0)
+        self.assertNotIn("stats", record)
+        self.assertEqual(sum(route["value"] for route in record["routes"]), record["value"])
+        for route in record["routes"]:
+            self.assertEqual(set(route), {"train", "value", "cells", "stops"})
+            for stop in route["stops"]:
+                self.assertEqual(set(stop), {"name", "cell", "value"})
+                self.assertIn(stop["cell"], route["cells"])
+
+    def test_json_batch(self):
+        records = json.loads(self._main(["Grand Trunk", "Pennsylvania"], "-f", "json", "--stats"))
+        self.assertEqual(sorted((record["railroad"], record["value"]) for record in records),
+                sorted(tuple(self._get_expected_record(name).values()) for name in ("Grand Trunk", "Pennsylvania")))
+        for record in records:
+            self.assertIn("search", record["stats"]["phases"])
+
+    def test_ndjson(self):
+        lines = self._main(["Grand Trunk", "Pennsylvania"], "-f", "ndjson").splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(sorted(json.loads(line)["railroad"] for line in lines), ["Grand Trunk", "Pennsylvania"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from routes18xx.find_best_routes import SerialWorkerPool
+from routes18xx.resultcache import ResultCache
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+BOARD_STATE_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "board-state-mail-contract-best.csv")
+RAILROADS_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "railroads-mail-contract-best.csv")
+PRIVATE_COMPANIES_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "companies-mail-contract-best.csv")
+
+
+class _Payload:
+    def __reduce__(self):
+        return (os.system, ("exit 1", ))
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.temp_dir.name, "results"))
+        self.worker_pool = SerialWorkerPool()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _iter_best_routes(self, active_railroad_names):
+        return [(railroad.name, route_set.value) for railroad, route_set in self._iter_route_sets(active_railroad_names)]
+
+    def _iter_route_sets(self, active_railroad_names):
+        return self.cache.iter_best_routes_from_files("1846", active_railroad_names, BOARD_STATE_FILENAME, RAILROADS_FILENAME,
+                PRIVATE_COMPANIES_FILENAME, self.worker_pool)
+
+    def _get_entry_filepaths(self):
+        return [os.path.join(dirpath, filename) for dirpath, _, filenames in os.walk(self.cache.directory)
+                for filename in filenames if filename.endswith(".pickle")]
+
+    def test_miss_then_hit(self):
+        self.assertEqual(self._iter_best_routes(["Grand Trunk"]), [("Grand Trunk", 120)])
+        self.assertEqual(len(self._get_entry_filepaths()), 1)
+
+        # A hit doesn't compute anything, so the worker pool isn't needed.
+        self.worker_pool = None
+        self.assertEqual(self._iter_best_routes(["Grand Trunk"]), [("Grand Trunk", 120)])
+        self.assertEqual(len(self._get_entry_filepaths()), 1)
+
+    def test_hit_stats(self):
+        (_, route_set), = self._iter_route_sets(["Grand Trunk"])
+        self.assertNotIn("cache_hits", route_set.stats.counters)
+        self.assertIn("search", route_set.stats.phases)
+
+        (_, route_set), = self._iter_route_sets(["Grand Trunk"])
+        self.assertEqual(dict(route_set.stats.counters), {"cache_hits": 1})
+        self.assertEqual(list(route_set.stats.phases), ["cache"])
+
+    def test_nickname_shares_entry(self):
+        self.assertEqual(self._iter_best_routes(["GT", "Grand Trunk"]), [("Grand Trunk", 120)])
+        self.worker_pool = None
+        self.assertEqual(self._iter_best_routes(["GT"]), [("Grand Trunk", 120)])
+        self.assertEqual(len(self._get_entry_filepaths()), 1)
+
+    def test_eviction(self):
+        self.cache.max_bytes = 3500
+        keys = {name: self.cache.key("1846", name, [], []) for name in ("Baltimore & Ohio", "Erie", "Grand Trunk", "Pennsylvania")}
+        with mock.patch.object(self.cache, "_scan", wraps=self.cache._scan) as scan:
+            for last_used_time, name in enumerate(["Baltimore & Ohio", "Erie", "Grand Trunk"], 1):
+                self.cache.put(keys[name], name, "x" * 1000)
+                os.utime(self.cache._get_entry_filepath(keys[name]), (last_used_time, last_used_time))
+            # Only the first put looks at the whole cache.
+            self.assertEqual(scan.call_count, 1)
+
+            self.assertEqual(self.cache.get(keys["Baltimore & Ohio"]), ("Baltimore & Ohio", "x" * 1000))
+            self.cache.put(keys["Pennsylvania"], "Pennsylvania", "x" * 1000)
+            self.assertEqual(scan.call_count, 2)
+
+        # The least recently used entries are evicted, until there's room to spare.
+        for name, is_cached in [("Baltimore & Ohio", True), ("Erie", False), ("Grand Trunk", False), ("Pennsylvania", True)]:
+            self.assertEqual(os.path.exists(self.cache._get_entry_filepath(keys[name])), is_cached, name)
+
+    def test_unsafe_entry_is_discarded(self):
+        key = self.cache.key("1846", "Grand Trunk", [], [])
+        self.cache.put(key, None, None)
+        entry_filepath, = self._get_entry_filepaths()
+        with open(entry_filepath, "wb") as entry_file:
+            pickle.dump(_Payload(), entry_file)
+
+        self.assertIsNone(self.cache.get(key))
+        self.assertFalse(os.path.exists(entry_filepath))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import unittest
+
+from routes18xx.find_best_routes import SerialWorkerPool, load_from_files
+from routes18xx.routestore import RouteStore
+from routes18xx.solver import RouteSolver
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+BOARD_STATE_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "board-state-final.csv")
+RAILROADS_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "railroads-final.csv")
+
+
+class RouteStoreTest(unittest.TestCase):
+    def test_edges_are_stored_little_endian(self):
+        game, board, railroads = load_from_files("1846", BOARD_STATE_FILENAME, RAILROADS_FILENAME)
+        railroad = railroads["Baltimore & Ohio"]
+        with SerialWorkerPool() as worker_pool:
+            solver = RouteSolver(game, board, railroads, railroad.name, worker_pool)
+            solver.solve()
+        run_routes_by_train = {}
+        for (train, _), run_route in solver._run_routes.items():
+            run_routes_by_train.setdefault(train, []).append(run_route)
+        store = RouteStore.from_run_routes(game, railroad, run_routes_by_train)
+
+        # Some routes need more than one word, which is where the word order matters.
+        edge_offsets = store._columns["edge_offsets"]
+        self.assertTrue(any(edge_offsets[index + 1] - edge_offsets[index] > 1 for index in range(len(store))))
+        for index in range(len(store)):
+            tile_indices = [store._tile_indices[tile] for tile in store.run_route(index)]
+            edges = 0
+            for from_index, to_index in zip(tile_indices, tile_indices[1:]):
+                edges |= 1 << store._get_edge_number(from_index, to_index)
+            self.assertEqual(store.edges(index), edges)
+
+            edge_words = store._columns["edge_words"][edge_offsets[index]:edge_offsets[index + 1]]
+            self.assertEqual(edge_words.tobytes(), edges.to_bytes(len(edge_words) * 8, "little"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import unittest
+
+from routes18xx.server import RouteServer, create_http_server
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+
+def _read(filename):
+    with open(os.path.join(TEST_DATA_ROOT_DIR, filename)) as data_file:
+        return data_file.read()
+
+
+class _BlockingRouteServer(RouteServer):
+    """Blocks each computation until its request is cancelled."""
+    def __init__(self):
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+        super().__init__(processes=1, preload_games=[])
+
+    def _compute(self, job):
+        self.started.set()
+        if job.cancel_token._event.wait(10):
+            self.cancelled.set()
+        job.cancel_token.raise_if_cancelled()
+
+
+class RouteServerTest(unittest.TestCase):
+    def _serve(self, route_server):
+        http_server = create_http_server(route_server, port=0)
+        thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(route_server.close)
+        self.addCleanup(http_server.server_close)
+        self.addCleanup(http_server.shutdown)
+        return http_server.server_address
+
+    def _post(self, address, body):
+        connection = http.client.HTTPConnection(*address, timeout=60)
+        self.addCleanup(connection.close)
+        connection.request("POST", "/routes", json.dumps(body), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_routes(self):
+        address = self._serve(RouteServer(processes=1, preload_games=[]))
+        status, body = self._post(address, {
+            "game": "1846",
+            "active_railroads": ["Grand Trunk"],
+            "board_state": _read("board-state-mail-contract-best.csv"),
+            "railroads": _read("railroads-mail-contract-best.csv"),
+            "private_companies": _read("companies-mail-contract-best.csv")
+        })
+        self.assertEqual(status, 200)
+        self.assertEqual([(record["railroad"], record["value"]) for record in body["results"]], [("Grand Trunk", 120)])
+
+    def test_invalid_payloads(self):
+        address = self._serve(RouteServer(processes=1, preload_games=[]))
+        for request_payload in ({"game": 1846}, {"game": ["1846"]}, {"game": "1846", "active_railroads": 5}):
+            with self.subTest(payload=request_payload):
+                status, body = self._post(address, request_payload)
+                self.assertEqual(status, 400)
+                self.assertIn("error", body)
+
+    def test_disconnect_cancels_request(self):
+        route_server = _BlockingRouteServer()
+        address = self._serve(route_server)
+
+        body = json.dumps({"game": "1846"}).encode("utf-8")
+        with socket.create_connection(address) as client:
+            client.sendall(b"POST /routes HTTP/1.1\r\nContent-Type: application/json\r\n" +
+                    f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+            self.assertTrue(route_server.started.wait(10))
+        self.assertTrue(route_server.cancelled.wait(10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import unittest
+
+from routes18xx.find_best_routes import SerialWorkerPool, _SharedWalks, _find_all_routes, _get_active_railroads, \
+        find_best_routes, iter_best_routes, load_from_files
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+# (game, board state file, railroads file). The synthetic board has a full city which some railroads can run through,
+# and others can't.
+STATES = [
+    ("1846", "board-state-synthetic.csv", "railroads-synthetic.csv"),
+    ("1846", "board-state-final.csv", "railroads-final.csv"),
+    ("1889", "board-state-20-07-03.csv", "railroads-20-07-03.csv")
+]
+
+def _load(game_name, board_state_filename, railroads_filename, private_companies_filename=None):
+    game_data_dir = os.path.join(TEST_DATA_ROOT_DIR, game_name)
+    return load_from_files(game_name, os.path.join(game_data_dir, board_state_filename), os.path.join(game_data_dir, railroads_filename),
+            os.path.join(game_data_dir, private_companies_filename) if private_companies_filename else None)
+
+def _is_runnable(railroad, route):
+    """Whether the railroad can run the route's path, in order."""
+    path = list(route)
+    for previous_tile, tile, next_tile in zip(path, path[1:], path[2:]):
+        if previous_tile.cell not in tile.paths() or next_tile.cell not in tile.paths(previous_tile.cell):
+            return False
+        if tile.is_stop and not tile.passable(previous_tile.cell, railroad):
+            return False
+    return True
+
+def _route_key(run_route):
+    # A route found from either end is the same route.
+    cells = tuple(str(tile.cell) for tile in run_route)
+    return (str(run_route.train), min(cells, cells[::-1]))
+
+
+class SharedWalksTest(unittest.TestCase):
+    def test_shared_routes_match_single_railroad_routes(self):
+        for state in STATES:
+            game, board, railroads = _load(*state)
+            active_railroads = _get_active_railroads(railroads)
+            shared_walks = _SharedWalks(game, board, active_railroads)
+            for railroad in active_railroads:
+                with self.subTest(state=state[1], railroad=railroad.name):
+                    shared_routes = _find_all_routes(game, board, railroad, shared_walks)
+                    self.assertEqual(shared_routes, _find_all_routes(game, board, railroad, {}))
+                    for routes in shared_routes.values():
+                        for route in routes:
+                            self.assertTrue(_is_runnable(railroad, route), f"{railroad.name} can't run {route}")
+
+    def test_batch_matches_single_railroad_search(self):
+        for state in STATES:
+            game, board, railroads = _load(*state)
+            with SerialWorkerPool() as worker_pool:
+                for railroad, route_set in iter_best_routes(game, board, railroads, worker_pool=worker_pool):
+                    with self.subTest(state=state[1], railroad=railroad.name):
+                        expected_route_set = find_best_routes(game, board, railroads, railroad, worker_pool)
+                        self.assertEqual(route_set.value, expected_route_set.value)
+                        self.assertEqual(sorted(map(_route_key, route_set)), sorted(map(_route_key, expected_route_set)))
+
+    def test_batch_includes_railroads_without_trains(self):
+        game, board, railroads = _load("1846", "board-state-mail-contract-best.csv", "railroads-mail-contract-best.csv",
+                "companies-mail-contract-best.csv")
+        with SerialWorkerPool() as worker_pool:
+            route_sets = {railroad.name: route_set for railroad, route_set in iter_best_routes(game, board, railroads, worker_pool=worker_pool)}
+        self.assertEqual(railroads["Illinois Central"].trains, [])
+        self.assertEqual(route_sets["Illinois Central"].value, 0)
+        self.assertFalse(route_sets["Illinois Central"])
+        self.assertEqual(route_sets["Grand Trunk"].value, 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import itertools
+import os
+import unittest
+
+from routes18xx.find_best_routes import SerialWorkerPool, WorkerPool, load_from_files
+from routes18xx.solver import RouteSolver, get_tile_placements
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+def _load(game_name, board_state_filename, railroads_filename):
+    game_data_dir = os.path.join(TEST_DATA_ROOT_DIR, game_name)
+    return load_from_files(game_name, os.path.join(game_data_dir, board_state_filename), os.path.join(game_data_dir, railroads_filename))
+
+def _route_key(run_route):
+    # A route found from either end is the same route.
+    cells = tuple(str(tile.cell) for tile in run_route)
+    return (str(run_route.train), min(cells, cells[::-1]))
+
+
+class RouteSolverTest(unittest.TestCase):
+    def setUp(self):
+        self.game, self.board, self.railroads = _load("1846", "board-state-mid-game.csv", "railroads-mid-game.csv")
+
+    def assertSameRouteSet(self, route_set, expected_solver):
+        """
+        Route sets can tie, and which of them is found depends on the order routes were enumerated in, so this only
+        checks the route set is worth as much as the expected solver's, and is made up of the routes it found.
+        """
+        self.assertEqual(route_set.value, expected_solver.best_route_set.value)
+        expected_run_routes = {_route_key(run_route): run_route for run_route in expected_solver._run_routes.values()}
+        for run_route in route_set.run_routes:
+            self.assertIn(_route_key(run_route), expected_run_routes)
+            self.assertEqual(run_route.value, expected_run_routes[_route_key(run_route)].value)
+
+    def test_apply_matches_fresh_solve(self):
+        with SerialWorkerPool() as worker_pool:
+            solver = RouteSolver(self.game, self.board, self.railroads, "Grand Trunk", worker_pool)
+            solver.solve()
+            for placement in list(get_tile_placements(self.game, solver.board))[::15]:
+                with self.subTest(placement=str(placement)):
+                    board = self.board.copy()
+                    placement.apply(self.game, board, self.railroads)
+                    expected_solver = RouteSolver(self.game, board, self.railroads, "Grand Trunk", worker_pool)
+                    expected_solver.solve()
+                    self.assertSameRouteSet(solver.copy().apply(placement), expected_solver)
+
+    def test_apply_seeds_search(self):
+        # The best route set's run routes are rebuilt from the route store, so they aren't the solver's run routes.
+        with SerialWorkerPool() as worker_pool:
+            solver = RouteSolver(self.game, self.board, self.railroads, "Grand Trunk", worker_pool)
+            solver.solve()
+            solver.apply(list(get_tile_placements(self.game, solver.board, ["H16"]))[0])
+            self.assertIsNotNone(solver._get_seed_route_set())
+
+    def test_apply_seeds_search_with_worker_pool(self):
+        with WorkerPool(processes=2) as worker_pool:
+            solver = RouteSolver(self.game, self.board, self.railroads, "Grand Trunk", worker_pool)
+            solver.solve()
+            # H16 isn't on any of Grand Trunk's routes, so its best route set is still valid.
+            solver.apply(list(get_tile_placements(self.game, solver.board, ["H16"]))[0])
+            self.assertIsNotNone(solver._get_seed_route_set())
+
+    def test_station_placements_match_fresh_solve(self):
+        with SerialWorkerPool() as worker_pool:
+            solver = RouteSolver(self.game, self.board, self.railroads, "Grand Trunk", worker_pool)
+            base_value = solver.solve().value
+            results = solver.evaluate_station_placements()
+            self.assertTrue(results)
+            for placement, gain, best_route_set in results[::4]:
+                with self.subTest(placement=str(placement)):
+                    board = self.board.copy()
+                    placement.apply(self.game, board, self.railroads)
+                    expected_solver = RouteSolver(self.game, board, self.railroads, "Grand Trunk", worker_pool)
+                    expected_solver.solve()
+                    self.assertSameRouteSet(best_route_set, expected_solver)
+                    self.assertEqual(gain, best_route_set.value - base_value)
+
+    def test_train_purchases_match_fresh_solve(self):
+        railroad = self.railroads["Baltimore & Ohio"]
+        railroad_trains = list(railroad.trains)
+        with SerialWorkerPool() as worker_pool:
+            solver = RouteSolver(self.game, self.board, self.railroads, "Baltimore & Ohio", worker_pool)
+            base_value = solver.solve().value
+            results = solver.evaluate_train_purchases()
+            self.assertTrue(all(gain > 0 for _, gain, _ in results))
+            # The caller's railroad never owns the trains being evaluated.
+            self.assertEqual(railroad.trains, railroad_trains)
+            for train, gain, best_route_set in results:
+                with self.subTest(train=str(train)):
+                    railroads = dict(self.railroads)
+                    railroads["Baltimore & Ohio"] = railroad.copy(railroad_trains + [train])
+                    expected_solver = RouteSolver(self.game, self.board, railroads, "Baltimore & Ohio", worker_pool)
+                    expected_solver.solve()
+                    self.assertSameRouteSet(best_route_set, expected_solver)
+                    self.assertEqual(gain, best_route_set.value - base_value)
+
+    def test_upgrade_keeps_stations(self):
+        board = self.board.copy()
+        board.place_tile("E17", self.game.tiles["291"], 1)
+        space = board.get_space(board.cell("E17"))
+        self.assertEqual([station.railroad.name for station in space.stations], ["Pennsylvania"])
+        # Its only slot is still taken.
+        self.assertEqual(space.capacity, 1)
+        self.assertFalse(space.passable(board.cell("E15"), self.railroads["Grand Trunk"]))
+        with self.assertRaises(ValueError):
+            board.place_station(self.game, "E17", self.railroads["Grand Trunk"])
+
+    def test_upgrade_keeps_split_city_stations(self):
+        with SerialWorkerPool() as worker_pool:
+            solver = RouteSolver(self.game, self.board, self.railroads, "Illinois Central", worker_pool)
+            results = solver.evaluate_tile_placements(["D6"])
+            self.assertEqual([str(placement) for placement, _ in results], ["tile 298 on D6 in orientation 0"])
+
+            placement, best_route_set = results[0]
+            board = self.board.copy()
+            placement.apply(self.game, board, self.railroads)
+            space = board.get_space(board.cell("D6"))
+            self.assertEqual([station.railroad.name for station in space.stations], ["Illinois Central"])
+            self.assertIn(board.cell("D8"), itertools.chain.from_iterable(space.get_station_branch(space.stations[0])))
+            expected_solver = RouteSolver(self.game, board, self.railroads, "Illinois Central", worker_pool)
+            expected_solver.solve()
+            self.assertSameRouteSet(best_route_set, expected_solver)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import os
+import unittest
+
+from routes18xx.find_best_routes import SerialWorkerPool, find_best_routes, load_from_files
+from routes18xx.stats import RouteStats
+
+TEST_DATA_ROOT_DIR = os.path.join(os.path.dirname(__file__), "data", "1846")
+BOARD_STATE_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "board-state-mid-game.csv")
+RAILROADS_FILENAME = os.path.join(TEST_DATA_ROOT_DIR, "railroads-mid-game.csv")
+
+
+class RouteStatsTest(unittest.TestCase):
+    def test_merge_and_to_dict(self):
+        stats = RouteStats()
+        stats.add_phase_time("search", 2.0, 1.5)
+        stats.count("search_nodes", 10)
+        stats.count_routes("2", 5, 3)
+        stats.worker_processes = 2
+
+        worker_stats = RouteStats()
+        worker_stats.add_phase_time("worker", 3.0, 3.0)
+        worker_stats.count("search_nodes", 5)
+        worker_stats.count_routes("4", 7, 7)
+        stats.merge(worker_stats)
+
+        self.assertEqual(stats.to_dict(), {
+            "phases": {"search": {"wall": 2.0, "cpu": 1.5}, "worker": {"wall": 3.0, "cpu": 3.0}},
+            "counters": {"routes_enumerated": 12, "routes_valid": 10, "search_nodes": 15},
+            "routes_by_train": {"2": {"enumerated": 5, "valid": 3}, "4": {"enumerated": 7, "valid": 7}},
+            "worker_utilization": 0.75
+        })
+        self.assertEqual(str(stats).splitlines(), [
+            "search: 2.000s wall, 1.500s CPU",
+            "worker: 3.000s wall, 3.000s CPU",
+            "2: 5 routes enumerated, 3 valid",
+            "4: 7 routes enumerated, 7 valid",
+            "routes_enumerated: 12",
+            "routes_valid: 10",
+            "search_nodes: 15",
+            "worker utilization: 75.0%"
+        ])
+
+    def test_phase(self):
+        stats = RouteStats()
+        for _ in range(2):
+            with stats.phase("valuation"):
+                pass
+        self.assertEqual(list(stats.phases), ["valuation"])
+        self.assertTrue(all(time >= 0 for time in stats.phases["valuation"]))
+        # Without a search, there's no utilization to report.
+        self.assertIsNone(stats.worker_utilization)
+
+    def test_attached_to_route_set(self):
+        game, board, railroads = load_from_files("1846", BOARD_STATE_FILENAME, RAILROADS_FILENAME)
+        with SerialWorkerPool() as worker_pool:
+            best_route_set = find_best_routes(game, board, railroads, railroads["Grand Trunk"], worker_pool)
+
+        stats = best_route_set.stats
+        for phase in ("enumeration", "valuation", "search"):
+            self.assertIn(phase, stats.phases)
+        self.assertEqual(stats.counters["routes_enumerated"], sum(counts["enumerated"] for counts in stats.routes_by_train.values()))
+        self.assertEqual({str(train) for train in stats.routes_by_train}, {str(train) for train in railroads["Grand Trunk"].trains})
+        # The stats can be written out with the rest of the result.
+        json.dumps(stats.to_dict())
+
+        # A stats object which is passed in is filled in, rather than a new one.
+        stats = RouteStats()
+        find_best_routes(game, board, railroads, railroads["Grand Trunk"], SerialWorkerPool(), stats)
+        self.assertIn("search", stats.phases)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from routes18xx import boardstate, railroads, synthetic
+from routes18xx.find_best_routes import load_from_files
+
+
+class SyntheticTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_seed_is_reproducible(self):
+        for game_name in ("1846", "1889"):
+            with self.subTest(game=game_name):
+                self.assertEqual(synthetic.generate(game_name, density=0.3, seed=7), synthetic.generate(game_name, density=0.3, seed=7))
+
+    def test_written_state_loads(self):
+        board_state_rows, railroads_rows = synthetic.generate("1846", density=0.4, stations=1, railroad_count=3, trains_per_railroad=2, seed=3)
+        board_state_filepath = os.path.join(self.temp_dir.name, "board-state.csv")
+        railroads_filepath = os.path.join(self.temp_dir.name, "railroads.csv")
+        synthetic.write_csv(board_state_rows, boardstate.FIELDNAMES, board_state_filepath)
+        synthetic.write_csv(railroads_rows, railroads.FIELDNAMES, railroads_filepath)
+
+        game, board, railroads_in_play = load_from_files("1846", board_state_filepath, railroads_filepath)
+        self.assertEqual(sorted(row["name"] for row in railroads_rows), sorted({railroad.name for railroad in railroads_in_play.values()}))
+        self.assertEqual(game.current_phase, game.phases[-1])
+        for row in railroads_rows:
+            railroad = railroads_in_play[row["name"]]
+            self.assertEqual(len(railroad.trains), 2)
+            # The home station, plus at most one more.
+            self.assertIn(len(board.stations(railroad.name)), (1, 2))
+        self.assertEqual({str(cell) for cell in board._placed_tiles}, {row["coord"] for row in board_state_rows})
+
+    def test_unknown_phase(self):
+        with self.assertRaises(ValueError):
+            synthetic.generate("1846", phase="9")
+
+
+if __name__ == "__main__":
+    unittest.main()
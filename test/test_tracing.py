@@ -0,0 +1,64 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from routes18xx import tracing
+from routes18xx.find_best_routes import WorkerPool, main
+from routes18xx.tracing import TRACER, read_trace
+
+
+def _trace_from_worker():
+    TRACER.event("worker", "Traced from a worker.")
+    return os.getpid()
+
+
+class TracingTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.trace_filepath = os.path.join(self.temp_dir.name, "trace.jsonl")
+
+    def tearDown(self):
+        TRACER.close()
+        self.temp_dir.cleanup()
+
+    def test_open_leaves_environment_alone(self):
+        environ = dict(os.environ)
+        TRACER.open(self.trace_filepath)
+        self.assertEqual(dict(os.environ), environ)
+        TRACER.close()
+        self.assertEqual(dict(os.environ), environ)
+
+    def test_records_are_json_lines(self):
+        TRACER.open(self.trace_filepath)
+        TRACER.event("walk", "Walked from {cell}.", cell="D6", stops={"D6", "D8"}, count=3)
+        TRACER.close()
+
+        with open(self.trace_filepath) as trace_file:
+            timestamp, pid, name, fields = json.loads(trace_file.readline())
+        self.assertEqual((pid, name), (os.getpid(), "walk"))
+        self.assertEqual(sorted(fields["stops"]), ["D6", "D8"])
+        self.assertEqual([(event["name"], event["fields"]["count"]) for event in read_trace(self.trace_filepath)], [("walk", 3)])
+
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            main(["trace", self.trace_filepath, "-n", "walk"])
+        self.assertEqual(json.loads(stdout.getvalue())["fields"]["cell"], "D6")
+
+    def test_workers_trace_to_open_file(self):
+        TRACER.open(self.trace_filepath)
+        with WorkerPool(processes=1) as worker_pool:
+            worker_pid = worker_pool.pool.apply(_trace_from_worker)
+        self.assertEqual([(event["pid"], event["name"]) for event in read_trace(self.trace_filepath)], [(worker_pid, "worker")])
+
+    def test_spawned_workers_trace_to_open_file(self):
+        TRACER.open(self.trace_filepath)
+        with multiprocessing.get_context("spawn").Pool(1, initializer=tracing.init_worker, initargs=(TRACER.filepath, )) as pool:
+            worker_pid = pool.apply(_trace_from_worker)
+        self.assertEqual([(event["pid"], event["name"]) for event in read_trace(self.trace_filepath)], [(worker_pid, "worker")])
+
+
+if __name__ == "__main__":
+    unittest.main()